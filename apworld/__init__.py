@@ -1,6 +1,9 @@
-from typing import Any
+from typing import Any, ClassVar, Union
+import logging
+import settings
 
 from . import options, utils
+from .rule_profiling import Rule, RuleProfiler
 from BaseClasses import CollectionState, Item, ItemClassification, Location, Region, MultiWorld
 from Options import OptionError
 from collections import defaultdict
@@ -9,11 +12,31 @@ from .utils import Cluster
 import Fill
 
 
+class ArchipeladokuSettings(settings.Group):
+    class GenerationTimeLimit(int):
+        """Estimated puzzle generation time per player, in seconds, above which a warning is logged.
+        0 disables the check.
+        """
+
+    class RejectOverTimeLimit(settings.Bool):
+        """Fail generation instead of only warning when a player goes above the generation time limit."""
+
+    class ProfileAccessRules(settings.Bool):
+        """Count evaluations, time and results of every access rule, and log a report per player after fill.
+        Slows down generation a little, meant for measuring rule performance.
+        """
+
+    generation_time_limit: GenerationTimeLimit = GenerationTimeLimit(60)
+    reject_over_time_limit: Union[RejectOverTimeLimit, bool] = False
+    profile_access_rules: Union[ProfileAccessRules, bool] = False
+
+
 class ArchipeladokuWorld(World):
     game = "Archipeladoku"
 
     options_dataclass = options.ArchipeladokuOptions
     options: options.ArchipeladokuOptions
+    settings: ClassVar[ArchipeladokuSettings]
 
     item_name_to_id = utils.item_name_to_id
     location_name_to_id = utils.location_name_to_id
@@ -25,7 +48,9 @@ class ArchipeladokuWorld(World):
     block_unlock_order: list[tuple[int, int]]
     clusters: dict[int, Cluster]
     filler_counts: dict[str, int]
+    filler_sampler: utils.FillerSampler | None
     pre_fill_items: list[Item]
+    rule_profiler: RuleProfiler | None
 
 
     def __init__(self, multiworld: MultiWorld, player: int):
@@ -35,7 +60,9 @@ class ArchipeladokuWorld(World):
         self.clusters = {}
         self.duplicate_progression_count = 0
         self.filler_counts = {}
+        self.filler_sampler = None
         self.pre_fill_items = []
+        self.rule_profiler = None
         self.item_name_groups = self.__class__.item_name_groups.copy()
         self.location_name_groups = self.__class__.location_name_groups.copy()
 
@@ -56,65 +83,34 @@ class ArchipeladokuWorld(World):
             self.options.block_size = self.options.block_size.from_any(slot_data["blockSize"])
             self.options.progression = self.options.progression.from_any(slot_data["progression"])
 
-            for list_idx, positions in enumerate(slot_data["clusters"]):
-                cluster_id = list_idx + 1
-                positions_set = set(tuple(pos) for pos in positions)
-                group_blocks = set(
-                    block
-                    for pos in positions_set
-                    for block in utils.build_blocks(self.options.block_size.value, pos)
-                )
-                self.clusters[cluster_id] = utils.Cluster(
-                    id=cluster_id,
-                    blocks=group_blocks,
-                    positions=positions_set,
-                )
+            # Slot data lists one board per cluster.
+            self.clusters = utils.build_clusters(
+                self.options.block_size.value,
+                [tuple(pos) for positions in slot_data["clusters"] for pos in positions],
+            )
 
             self.block_unlock_order = [tuple(block) for block in slot_data["blockUnlockOrder"]]
             self.duplicate_progression_count = slot_data["duplicateProgressionCount"]
             self.filler_counts = slot_data["fillerCounts"]
 
         else:
-            board_positions = utils.position_boards(
-                self.options.block_size.value,
-                self.options.boards_per_cluster.value,
-                utils.get_number_of_boards(
-                    self.options.block_size.value,
-                    self.options.number_of_boards.value,
-                ),
-            )
-
-            grouped_positions = utils.group_positions(
-                self.options.block_size.value,
-                board_positions,
-            )
-
-            for idx, positions in grouped_positions.items():
-                group_blocks = set(
-                    block
-                    for pos in positions
-                    for block in utils.build_blocks(self.options.block_size.value, pos)
-                )
-                self.clusters[idx] = utils.Cluster(
-                    id=idx,
-                    blocks=group_blocks,
-                    positions=set(positions),
+            max_number_of_boards = utils.get_max_number_of_boards(self.options.block_size.value)
+            if self.options.number_of_boards.value > max_number_of_boards:
+                logging.warning(
+                    f"Archipeladoku: {self.multiworld.get_player_name(self.player)} has"
+                    f" {self.options.number_of_boards.value} boards, which is above the maximum of"
+                    f" {max_number_of_boards} for this block size. Using {max_number_of_boards} boards."
                 )
 
-            self.block_unlock_order = utils.build_block_unlock_order(
-                self.options.block_size.value,
-                utils.get_number_of_boards(
-                    self.options.block_size.value,
-                    self.options.number_of_boards.value,
-                ),
-                self.clusters,
-                self.random,
-            )
+            self.check_generation_cost()
 
-            initial_unlock_count = self.options.block_size.value
-            progression_items = len(self.block_unlock_order) - initial_unlock_count
-            self.duplicate_progression_count = progression_items * self.options.duplicate_progression.value // 100
-            self.filler_counts = utils.get_filler_counts(self.options, self.duplicate_progression_count)
+            # Drawn once from the world's own random, so the data doesn't depend on other players.
+            generation_data = utils.build_generation_data(self.options, self.random.getrandbits(64))
+
+            self.clusters = generation_data.clusters
+            self.block_unlock_order = generation_data.block_unlock_order
+            self.duplicate_progression_count = generation_data.duplicate_progression_count
+            self.filler_counts = generation_data.filler_counts
 
         initial_unlock_count = self.options.block_size.value
 
@@ -154,39 +150,101 @@ class ArchipeladokuWorld(World):
                 self.options.exclude_locations.value -= unused
 
 
+    def check_generation_cost(self) -> None:
+
+        cost = utils.estimate_generation_cost(self.options)
+        player_name = self.multiworld.get_player_name(self.player)
+        message = (
+            f"Archipeladoku: {player_name} has an estimated puzzle generation time of {cost.seconds:.0f}"
+            f" seconds, with {cost.locations} locations and {cost.items} items."
+        )
+        logging.info(message)
+
+        time_limit = self.settings.generation_time_limit
+        if time_limit <= 0 or cost.seconds <= time_limit:
+            return
+
+        if self.settings.reject_over_time_limit:
+            raise OptionError(
+                f"{message} This is above the limit of {time_limit} seconds. Try a smaller block size,"
+                f" fewer boards or a lower difficulty."
+            )
+
+        logging.warning(f"{message} This is above the limit of {time_limit} seconds.")
+
+
+    def profile_rule(self, kind: str, rule: Rule) -> Rule:
+        """Wrap a rule for profiling if it is enabled in the host settings."""
+
+        if self.rule_profiler is None:
+            return rule
+
+        return self.rule_profiler.wrap(kind, rule)
+
+
+    def find_block_region(
+        self,
+        positions: list[tuple[int, int]],
+        board_regions: dict[tuple[int, int], Region],
+        board_blocks: dict[tuple[int, int], set[tuple[int, int]]],
+        board_requirements: dict[tuple[int, int], int],
+    ) -> Region | None:
+        """Region of a board that is reachable whenever any of the boards sharing a block is, or None if
+        there is no such board.
+        """
+
+        match self.options.progression:
+            case options.Progression.option_fixed:
+                # Blocks unlock in order, so the board needing the fewest is reachable first.
+                return board_regions[min(positions, key=lambda pos: (board_requirements[pos], pos))]
+
+            case options.Progression.option_shuffled:
+                for position in positions:
+                    if all(board_blocks[position] <= board_blocks[other] for other in positions):
+                        return board_regions[position]
+
+                return None
+
+            case _:
+                raise ValueError("Invalid progression option")
+
+
     def create_regions(self) -> None:
 
+        if self.settings.profile_access_rules:
+            self.rule_profiler = RuleProfiler()
+
         menu = Region("Menu", self.player, self.multiworld)
         self.multiworld.regions.append(menu)
 
         initial_unlock_count = self.options.block_size.value
         initial_blocks = set(self.block_unlock_order[:initial_unlock_count])
-        cluster_unlock_requirements = utils.calculate_cluster_unlock_requirements(
+        board_unlock_requirements = utils.calculate_cluster_unlock_requirements(
             self.clusters,
             self.block_unlock_order,
             initial_unlock_count,
         )
-
-        block_region_map = {}
-        block_cluster_map = defaultdict(list)
-        for cluster in self.clusters.values():
-            for block in cluster.blocks:
-                for position in cluster.positions:
-                    block_cluster_map[block].append(position)
-
-        for cluster in self.clusters.values():
-            region = Region(f"Board {cluster.id}", self.player, self.multiworld)
+        board_regions = {}
+        board_blocks = {}
+        board_requirements = {}
+
+        # Every board is its own cluster, a region behind the rule for its own blocks.
+        for board in self.clusters.values():
+            [ position ] = board.positions
+            region = Region(f"Board {board.id}", self.player, self.multiworld)
             self.multiworld.regions.append(region)
             connection = menu.connect(region)
+            board_regions[position] = region
+            board_blocks[position] = board.blocks.difference(initial_blocks)
+            board_requirements[position] = board_unlock_requirements[board.id]
 
             match self.options.progression:
                 case options.Progression.option_fixed:
-                    connection.access_rule = lambda state, unlock_req=cluster_unlock_requirements[cluster.id]: \
+                    connection.access_rule = lambda state, unlock_req=board_requirements[position]: \
                         state.has("Progressive Block", self.player, unlock_req) if unlock_req > 0 else True
 
                 case options.Progression.option_shuffled:
-                    cluster_blocks = cluster.blocks.difference(initial_blocks)
-                    block_names = [utils.block_item_name(row, col) for (row, col) in cluster_blocks]
+                    block_names = [utils.block_item_name(row, col) for (row, col) in board_blocks[position]]
 
                     connection.access_rule = lambda state, block_names=block_names: \
                         state.has_all(block_names, self.player)
@@ -194,62 +252,64 @@ class ArchipeladokuWorld(World):
                 case _:
                     raise ValueError("Invalid progression option")
 
+            connection.access_rule = self.profile_rule("Board connections", connection.access_rule)
+
             # Add board locations
-            for (row, col) in cluster.positions:
+            (row, col) = position
+            loc = ArchipeladokuLocation(
+                self.player,
+                utils.board_name(row, col),
+                utils.board_id(row, col),
+                region,
+            )
+            region.locations.append(loc)
+
+            # Add row and column locations
+            for offset in range(self.options.block_size.value):
                 loc = ArchipeladokuLocation(
                     self.player,
-                    utils.board_name(row, col),
-                    utils.board_id(row, col),
+                    utils.row_name(row + offset, col),
+                    utils.row_id(row + offset, col),
                     region,
                 )
                 region.locations.append(loc)
 
-                # Add row and column locations
-                for offset in range(self.options.block_size.value):
-                    loc = ArchipeladokuLocation(
-                        self.player,
-                        utils.row_name(row + offset, col),
-                        utils.row_id(row + offset, col),
-                        region,
-                    )
-                    region.locations.append(loc)
-
-                    loc = ArchipeladokuLocation(
-                        self.player,
-                        utils.col_name(row, col + offset),
-                        utils.col_id(row, col + offset),
-                        region,
-                    )
-                    region.locations.append(loc)
-
-            # Add block locations
-            for (row, col) in cluster.blocks:
-                block_clusters = block_cluster_map[(row, col)]
-                if block_region_map.get((row, col)) is None:
-                    if len(block_clusters) > 1:
-                        block_region = Region(
-                            f"Block {row},{col} Overlap",
-                            self.player,
-                            self.multiworld,
-                        )
-                        self.multiworld.regions.append(block_region)
-                        connection = region.connect(block_region)
-                        block_region_map[(row, col)] = block_region
-
-                    else:
-                        block_region = region
-
-                    loc = ArchipeladokuLocation(
-                        self.player,
-                        utils.block_name(row, col),
-                        utils.block_id(row, col),
-                        block_region,
-                    )
-                    block_region.locations.append(loc)
-
-                elif len(block_clusters) > 1:
-                    block_region = block_region_map[(row, col)]
-                    connection = region.connect(block_region)
+                loc = ArchipeladokuLocation(
+                    self.player,
+                    utils.col_name(row, col + offset),
+                    utils.col_id(row, col + offset),
+                    region,
+                )
+                region.locations.append(loc)
+
+        # Add block locations, solvable from any of the boards they are part of. Boards only share
+        # blocks with boards of the same group.
+        board_positions = [position for board in self.clusters.values() for position in board.positions]
+
+        for group in utils.group_positions(self.options.block_size.value, board_positions).values():
+            block_positions = defaultdict(list)
+
+            for position in sorted(group):
+                for block in utils.build_blocks(self.options.block_size.value, position):
+                    block_positions[block].append(position)
+
+            for (row, col), positions in block_positions.items():
+                block_region = self.find_block_region(positions, board_regions, board_blocks, board_requirements)
+
+                if block_region is None:
+                    block_region = Region(f"Block {row},{col} Overlap", self.player, self.multiworld)
+                    self.multiworld.regions.append(block_region)
+
+                    for position in positions:
+                        board_regions[position].connect(block_region)
+
+                loc = ArchipeladokuLocation(
+                    self.player,
+                    utils.block_name(row, col),
+                    utils.block_id(row, col),
+                    block_region,
+                )
+                block_region.locations.append(loc)
 
         victory_location = ArchipeladokuLocation(
             self.player,
@@ -269,7 +329,7 @@ class ArchipeladokuWorld(World):
 
         match self.options.progression:
             case options.Progression.option_fixed:
-                last_cluster_requirement = max(cluster_unlock_requirements.values())
+                last_cluster_requirement = max(board_unlock_requirements.values())
                 victory_location.access_rule = lambda state, last_cluster_requirement=last_cluster_requirement: \
                     state.has("Progressive Block", self.player, last_cluster_requirement)
 
@@ -285,13 +345,21 @@ class ArchipeladokuWorld(World):
             case _:
                 raise ValueError("Invalid progression option")
 
-        self.multiworld.completion_condition[self.player] = lambda state: \
-            state.has(victory_item.name, self.player)
+        victory_location.access_rule = self.profile_rule("Victory", victory_location.access_rule)
+        self.multiworld.completion_condition[self.player] = self.profile_rule(
+            "Completion condition",
+            lambda state: state.has(victory_item.name, self.player),
+        )
 
 
     def create_items(self) -> None:
 
         initial_unlock_count = self.options.block_size.value
+        # Only shuffled block items have a name per block, so the first copy of each keeps being balanced.
+        reduced_balancing = (
+            self.options.block_balancing == options.BlockBalancing.option_reduced
+            and self.options.progression == options.Progression.option_shuffled
+        )
         items = []
 
         for ( row, col ) in self.block_unlock_order[initial_unlock_count:]:
@@ -317,6 +385,9 @@ class ArchipeladokuWorld(World):
                 item = self.create_item(original_item.name)
                 items.append(item)
 
+                if reduced_balancing:
+                    item.classification = ItemClassification.progression_skip_balancing
+
         pre_fill_nothing_count = 0
 
         if self.multiworld.players > 1:
@@ -394,15 +465,85 @@ class ArchipeladokuWorld(World):
             fill_locations.pop().place_locked_item(item)
 
 
+    @classmethod
+    def stage_fill_hook(
+        cls,
+        multiworld: MultiWorld,
+        progitempool: list[Item],
+        usefulitempool: list[Item],
+        filleritempool: list[Item],
+        fill_locations: list[Location],
+    ) -> None:
+
+        worlds = {
+            world.player: world
+            for world in multiworld.get_game_worlds(cls.game)
+            if world.options.block_fill_order == options.BlockFillOrder.option_unlock_order
+            and world.options.progression == options.Progression.option_shuffled
+        }
+
+        if not worlds:
+            return
+
+        pool_indices = defaultdict(list)
+        for idx, item in enumerate(progitempool):
+            if item.player in worlds:
+                pool_indices[item.player].append(idx)
+
+        # Fill takes items from the end of the pool and places each one assuming the rest of the pool is
+        # collected. Each player's block items are reordered within the pool slots they already take, so
+        # the first blocks to unlock are placed last, and duplicates first since logic never needs them.
+        for player, indices in pool_indices.items():
+            unlock_indices = {
+                utils.block_item_name(row, col): idx
+                for idx, (row, col) in enumerate(worlds[player].block_unlock_order)
+            }
+            duplicate_index = len(unlock_indices)
+            seen_names = set()
+            ranked_items = []
+
+            for idx in indices:
+                item = progitempool[idx]
+                if item.name in seen_names:
+                    ranked_items.append((duplicate_index, item))
+
+                else:
+                    seen_names.add(item.name)
+                    ranked_items.append((unlock_indices.get(item.name, duplicate_index), item))
+
+            ranked_items.sort(key=lambda ranked_item: ranked_item[0])
+
+            for idx, (_, item) in zip(indices, ranked_items):
+                progitempool[idx] = item
+
+
+    def post_fill(self) -> None:
+
+        if self.rule_profiler is not None:
+            logging.info(self.rule_profiler.report(self.player_name))
+
+
     def fill_slot_data(self) -> dict[str, Any]:
 
+        (block_location_offsets, block_location_ids) = utils.build_block_location_index(
+            self.options.block_size.value,
+            self.clusters,
+            self.block_unlock_order,
+        )
+
         return {
             "blockSize": self.options.block_size.value,
             "blockUnlockOrder": self.block_unlock_order,
+            # Locations each block takes part in, indexed like blockUnlockOrder: the ids for block i are
+            # blockLocationIds[blockLocationOffsets[i]:blockLocationOffsets[i + 1]].
+            "blockLocationOffsets": block_location_offsets,
+            "blockLocationIds": block_location_ids,
             "clusters": [cluster.positions for cluster in self.clusters.values()],
             "difficulty": self.options.difficulty.value,
             "locationScouting": self.options.location_scouting.value,
             "progression": self.options.progression.value,
+            # The client draws from the seed as one stream. Only apworld/generation.py derives
+            # per-cluster streams from it, see utils.cluster_seed.
             "seed": self.random.getrandbits(32),
             "duplicateProgressionCount": self.duplicate_progression_count,
             "fillerCounts": self.filler_counts,
@@ -445,38 +586,27 @@ class ArchipeladokuWorld(World):
 
     def get_filler_item_name(self) -> str:
 
-        weights = self.get_filler_weights()
-        filler = self.random.choices(list(weights.keys()), weights=list(weights.values()))[0]
+        return self.get_filler_item_names(1)[0]
 
-        return filler
 
+    def get_filler_item_names(self, count: int) -> list[str]:
+        """Draw several filler items at once, the same as calling get_filler_item_name count times."""
 
-    def get_filler_weights(self) -> dict[str, int]:
+        # Options don't change after generate_early, so the weights are only computed once.
+        if self.filler_sampler is None:
+            self.filler_sampler = utils.build_filler_sampler(self.get_filler_weights())
 
-        weights = {
-            "Solve Selected Cell": self.options.solve_selected_cell_ratio.value,
-            "Solve Random Cell": self.options.solve_random_cell_ratio.value,
-            "Remove Random Candidate": self.options.remove_random_candidate_ratio.value,
-            "Emoji Trap": self.options.emoji_trap_ratio.value,
-            "Disco Trap": self.options.disco_trap_ratio.value,
-            "Tunnel Vision Trap": self.options.tunnel_vision_trap_ratio.value,
-            "Nothing": self.get_nothing_weight(),
-        }
+        return self.filler_sampler.sample(self.random, count)
 
-        if all(weight == 0 for weight in weights.values()):
-            weights["Nothing"] = 1
 
-        return weights
+    def get_filler_weights(self) -> dict[str, int]:
 
+        return utils.get_filler_weights(self.options)
 
-    def get_nothing_weight(self) -> int:
 
-        weight = self.options.block_size.value * 200 + 100 \
-            - self.options.solve_selected_cell_ratio.value \
-            - self.options.solve_random_cell_ratio.value \
-            - self.options.remove_random_candidate_ratio.value \
+    def get_nothing_weight(self) -> int:
 
-        return max(0, weight)
+        return utils.get_nothing_weight(self.options)
 
 
 class ArchipeladokuLocation(Location):
@@ -0,0 +1,329 @@
+import bisect
+import mmap
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
+
+from . import utils
+
+
+# File layout, all values little-endian:
+#
+#   Header:  magic "APDK", version u8, block size u8, bits per cell u8, padding u8, board count u32
+#   Index:   one entry per board, sorted by position: row u16, col u16, cluster id u16
+#   Boards:  one fixed-size record per board, in index order: packed givens followed by packed
+#            solution, block_size * block_size cells each, row by row, least significant bits first
+#
+# Givens use 0 for empty cells, so cells need 4 bits for block sizes up to 12 and 5 bits for 16.
+#
+# Cluster streams use the same packed grids, grouped into chunks that can be decoded on their own:
+#
+#   Header:  magic "APDS", version u8, block size u8, bits per cell u8, padding u8, cluster count u32
+#   Chunks:  one per cluster, in unlock order: cluster id u16, unlock requirement u32, board count u16,
+#            then per board row u16, col u16, packed givens and packed solution
+
+magic = b"APDK"
+version = 1
+header_struct = struct.Struct("<4sBBBxI")
+index_struct = struct.Struct("<HHH")
+
+stream_magic = b"APDS"
+stream_version = 1
+chunk_struct = struct.Struct("<HIH")
+chunk_board_struct = struct.Struct("<HH")
+
+
+@dataclass
+class Board:
+    row: int
+    col: int
+    cluster_id: int
+    givens: list[list[int]]
+    solution: list[list[int]]
+
+
+@dataclass
+class ClusterChunk:
+    cluster_id: int
+    unlock_requirement: int
+    boards: list[Board]
+
+
+def bits_per_cell(block_size: int) -> int:
+    """Number of bits needed to store a single cell value, including 0 for empty cells."""
+
+    return block_size.bit_length()
+
+
+def packed_grid_size(block_size: int) -> int:
+    """Number of bytes needed to store a single packed grid."""
+
+    return (block_size * block_size * bits_per_cell(block_size) + 7) // 8
+
+
+def pack_grid(block_size: int, values: Iterable[int]) -> bytes:
+    """Pack a flat sequence of cell values into bytes."""
+
+    bits = bits_per_cell(block_size)
+    packed = 0
+
+    for idx, value in enumerate(values):
+        if value < 0 or value > block_size:
+            raise ValueError(f"Invalid cell value: {value}")
+        packed |= value << (idx * bits)
+
+    return packed.to_bytes(packed_grid_size(block_size), "little")
+
+
+def unpack_grid(block_size: int, data: memoryview) -> list[list[int]]:
+    """Unpack bytes into a grid of rows of cell values."""
+
+    bits = bits_per_cell(block_size)
+    mask = (1 << bits) - 1
+    packed = int.from_bytes(data, "little")
+    grid = []
+
+    for row in range(block_size):
+        row_values = []
+        for col in range(block_size):
+            row_values.append((packed >> ((row * block_size + col) * bits)) & mask)
+        grid.append(row_values)
+
+    return grid
+
+
+def write_board_file(
+    path: str,
+    block_size: int,
+    clusters: list[Iterable[tuple[int, int]]],
+    givens: Iterable[tuple[int, int, int]],
+    solution: Iterable[tuple[int, int, int]],
+) -> None:
+    """Write generated boards to a binary board file.
+
+    `clusters` is a list of board positions per cluster, as in the `clusters` slot data. `givens` and
+    `solution` are (row, col, number) triples in grid coordinates, as produced by the client generator.
+    """
+
+    utils.block_size_to_dimensions(block_size)
+
+    given_cells = {(row, col): number for (row, col, number) in givens}
+    solution_cells = {(row, col): number for (row, col, number) in solution}
+    entries = []
+
+    for list_idx, positions in enumerate(clusters):
+        for (row, col) in positions:
+            entries.append((row, col, list_idx + 1))
+
+    entries.sort()
+
+    with open(path, "wb") as file:
+        file.write(header_struct.pack(magic, version, block_size, bits_per_cell(block_size), len(entries)))
+
+        for entry in entries:
+            file.write(index_struct.pack(*entry))
+
+        for (board_row, board_col, _) in entries:
+            file.write(pack_board(block_size, board_row, board_col, given_cells, solution_cells))
+
+
+def pack_board(
+    block_size: int,
+    board_row: int,
+    board_col: int,
+    given_cells: dict[tuple[int, int], int],
+    solution_cells: dict[tuple[int, int], int],
+) -> bytes:
+    """Packed givens followed by packed solution of the board at a position."""
+
+    cells = [
+        (board_row + row, board_col + col)
+        for row in range(block_size)
+        for col in range(block_size)
+    ]
+
+    return (
+        pack_grid(block_size, [given_cells.get(cell, 0) for cell in cells])
+        + pack_grid(block_size, [solution_cells[cell] for cell in cells])
+    )
+
+
+def write_cluster_stream(
+    file: BinaryIO,
+    block_size: int,
+    clusters: list[Iterable[tuple[int, int]]],
+    block_unlock_order: list[tuple[int, int]],
+    givens: Iterable[tuple[int, int, int]],
+    solution: Iterable[tuple[int, int, int]],
+) -> None:
+    """Write generated boards to an open binary file as one chunk per cluster.
+
+    Arguments are as for `write_board_file`, plus the `blockUnlockOrder` slot data. Chunks are ordered
+    by the number of blocks needed to unlock the cluster, so a reader gets the playable clusters first.
+    The file is flushed after every chunk, which lets it be a pipe or socket read while writing.
+    """
+
+    utils.block_size_to_dimensions(block_size)
+
+    given_cells = {(row, col): number for (row, col, number) in givens}
+    solution_cells = {(row, col): number for (row, col, number) in solution}
+    cluster_map = {
+        list_idx + 1: utils.Cluster(
+            id=list_idx + 1,
+            blocks=set().union(*(utils.build_blocks(block_size, pos) for pos in positions)),
+            positions=set(positions),
+        )
+        for list_idx, positions in enumerate(clusters)
+    }
+    unlock_requirements = utils.calculate_cluster_unlock_requirements(
+        cluster_map,
+        block_unlock_order,
+        block_size,
+    )
+
+    file.write(header_struct.pack(
+        stream_magic, stream_version, block_size, bits_per_cell(block_size), len(cluster_map),
+    ))
+
+    for cluster_id in sorted(cluster_map, key=lambda cluster_id: (unlock_requirements[cluster_id], cluster_id)):
+        positions = sorted(cluster_map[cluster_id].positions)
+        file.write(chunk_struct.pack(cluster_id, unlock_requirements[cluster_id], len(positions)))
+
+        for (board_row, board_col) in positions:
+            file.write(chunk_board_struct.pack(board_row, board_col))
+            file.write(pack_board(block_size, board_row, board_col, given_cells, solution_cells))
+
+        file.flush()
+
+
+def read_exact(file: BinaryIO, size: int) -> bytes:
+    """Read exactly size bytes, waiting for more on short reads from pipes and sockets."""
+
+    data = bytearray()
+
+    while len(data) < size:
+        chunk = file.read(size - len(data))
+        if not chunk:
+            raise EOFError("Cluster stream ended in the middle of a chunk")
+        data += chunk
+
+    return bytes(data)
+
+
+def iter_cluster_stream(file: BinaryIO) -> Iterator[ClusterChunk]:
+    """Read a cluster stream, yielding each cluster as soon as its chunk has arrived."""
+
+    (file_magic, file_version, block_size, bits, cluster_count) = \
+        header_struct.unpack(read_exact(file, header_struct.size))
+
+    if file_magic != stream_magic:
+        raise ValueError("Not an Archipeladoku cluster stream")
+
+    if file_version != stream_version or bits != bits_per_cell(block_size):
+        raise ValueError(f"Unsupported cluster stream version: {file_version}")
+
+    grid_size = packed_grid_size(block_size)
+
+    for _ in range(cluster_count):
+        (cluster_id, unlock_requirement, board_count) = chunk_struct.unpack(read_exact(file, chunk_struct.size))
+        boards = []
+
+        for _ in range(board_count):
+            (row, col) = chunk_board_struct.unpack(read_exact(file, chunk_board_struct.size))
+            data = memoryview(read_exact(file, grid_size * 2))
+            boards.append(Board(
+                row=row,
+                col=col,
+                cluster_id=cluster_id,
+                givens=unpack_grid(block_size, data[:grid_size]),
+                solution=unpack_grid(block_size, data[grid_size:]),
+            ))
+
+        yield ClusterChunk(cluster_id=cluster_id, unlock_requirement=unlock_requirement, boards=boards)
+
+
+class BoardFile:
+    """Read-only view of a binary board file.
+
+    The file is memory-mapped and only the index is decoded when opened. Boards are decoded on demand
+    from slices of the mapping, so fetching one board doesn't touch the rest of the file.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+
+        (file_magic, file_version, self.block_size, bits, board_count) = \
+            header_struct.unpack_from(self.view, 0)
+
+        if file_magic != magic:
+            self.close()
+            raise ValueError("Not an Archipeladoku board file")
+
+        if file_version != version or bits != bits_per_cell(self.block_size):
+            self.close()
+            raise ValueError(f"Unsupported board file version: {file_version}")
+
+        index_start = header_struct.size
+        self.positions = []
+        self.cluster_ids = []
+
+        for (row, col, cluster_id) in index_struct.iter_unpack(
+            self.view[index_start:index_start + board_count * index_struct.size]
+        ):
+            self.positions.append((row, col))
+            self.cluster_ids.append(cluster_id)
+
+        self.grid_size = packed_grid_size(self.block_size)
+        self.boards_start = index_start + board_count * index_struct.size
+
+
+    def __enter__(self) -> "BoardFile":
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+    def close(self) -> None:
+
+        self.view.release()
+        self.mmap.close()
+        self.file.close()
+
+
+    def get_board(self, row: int, col: int) -> Board:
+        """Decode a single board by its position."""
+
+        idx = bisect.bisect_left(self.positions, (row, col))
+
+        if idx == len(self.positions) or self.positions[idx] != (row, col):
+            raise KeyError(f"No board at {row},{col}")
+
+        start = self.boards_start + idx * self.grid_size * 2
+        middle = start + self.grid_size
+        end = middle + self.grid_size
+
+        return Board(
+            row=row,
+            col=col,
+            cluster_id=self.cluster_ids[idx],
+            givens=unpack_grid(self.block_size, self.view[start:middle]),
+            solution=unpack_grid(self.block_size, self.view[middle:end]),
+        )
+
+
+    def get_cluster_positions(self, cluster_id: int) -> list[tuple[int, int]]:
+        """Board positions belonging to a cluster."""
+
+        return [
+            position
+            for position, position_cluster_id in zip(self.positions, self.cluster_ids)
+            if position_cluster_id == cluster_id
+        ]
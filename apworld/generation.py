@@ -0,0 +1,1098 @@
+"""Puzzle generation in Python.
+
+Follows the client generator in client/src/js/generator.ts: clusters are filled with numbers one at a
+time with randomized backtracking, then givens are removed from each cluster while it can still be
+solved with the techniques allowed by the difficulty. Clusters are given like the `clusters` slot data,
+a list of board positions per cluster in unlock order, and are numbered from 1 in that order.
+
+Removing givens is the expensive part, and its cost varies a lot with the seed and difficulty. With a
+time budget, a cluster that runs over starts its removal again with a singles only pass, which is
+much cheaper. Removal starts a fresh stream from utils.cluster_random each time, so a cluster that
+falls back always gets the same result, and the puzzle only depends on the seed and on which clusters
+fell back. Passing the recorded fallback clusters back in reproduces it without any timing.
+
+Trial removals go through IncrementalRemover, which keeps the candidates of the givens between
+removals and undoes its changes from a trail instead of solving the cluster from scratch every time.
+tools/benchmark_given_removal.py compares the two.
+
+Each cluster draws from its own stream for each stage, so the numbers a cluster gets don't depend on
+how many were used by the clusters before it. Placing numbers still depends on the numbers of earlier
+clusters that share cells with it, and removing givens on their givens in the shared cells, so only
+clusters without shared cells can be generated in isolation.
+"""
+
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable
+
+from . import utils
+from .propagation import ClusterGeometry, Contradiction, areas_by_cell, build_cluster_geometry
+
+
+Cell = tuple[int, int]
+
+backtrack_limit = 5000
+max_first_cluster_retries = 10
+max_difficulty_retries = 10
+fallback_difficulty = 1
+
+
+class GenerationError(Exception):
+    pass
+
+
+class BacktrackLimitError(GenerationError):
+    pass
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class GenerationProgress:
+    stage: str # "placing" or "removing"
+    cluster_id: int
+    cluster_count: int
+    done: int
+    total: int
+
+
+@dataclass
+class GeneratedPuzzles:
+    givens: dict[Cell, int]
+    solution: dict[Cell, int]
+    fallback_clusters: list[int]
+
+
+def numbers_from_bits(mask: int) -> list[int]:
+    """Numbers set in a candidate bitmask, in increasing order."""
+
+    numbers = []
+    number = 1
+
+    while mask:
+        if mask & 1:
+            numbers.append(number)
+        mask >>= 1
+        number += 1
+
+    return numbers
+
+
+def find_best_cell(cell_indices: Iterable[int], candidates: list[int]) -> int | None:
+    """The first cell with the fewest candidates."""
+
+    best_cell = None
+    best_count = None
+
+    for cell_index in cell_indices:
+        count = candidates[cell_index].bit_count()
+
+        if best_count is None or count < best_count:
+            best_cell = cell_index
+            best_count = count
+
+    return best_cell
+
+
+class LogicSolver:
+    """Solves a cluster with the techniques allowed by a difficulty, like solveWithLogic in the client.
+
+    Works on the local cell numbering of the cluster geometry. Only the areas of the cluster's own
+    boards are used, so each cluster has to be solvable on its own.
+    """
+
+    def __init__(self, geometry: ClusterGeometry):
+        self.geometry = geometry
+        self.block_size = geometry.block_size
+        self.full_mask = (1 << geometry.block_size) - 1
+        self.cell_count = len(geometry.cells)
+        self.line_areas = geometry.row_areas + geometry.col_areas
+        self.cell_line_blocks = geometry.cell_blocks
+        self.peer_sets = [set(peers) for peers in geometry.peers]
+
+
+    def initial_state(self, givens: list[int]) -> tuple[list[int], list[int]]:
+        """Solution and candidates with the givens placed."""
+
+        solution = list(givens)
+        candidates = [self.full_mask] * self.cell_count
+
+        for cell_index, number in enumerate(solution):
+            if number:
+                self.eliminate_from_peers(candidates, cell_index, number)
+
+        return solution, candidates
+
+
+    def eliminate_from_peers(self, candidates: list[int], cell_index: int, number: int) -> None:
+
+        bit = 1 << (number - 1)
+
+        for peer in self.geometry.peers[cell_index]:
+            if candidates[peer] & bit:
+                candidates[peer] &= ~bit
+
+                if candidates[peer] == 0:
+                    raise Contradiction()
+
+
+    def place(self, solution: list[int], candidates: list[int], cell_index: int, number: int) -> None:
+
+        solution[cell_index] = number
+        self.eliminate_from_peers(candidates, cell_index, number)
+
+
+    def solve(self, givens: list[int], difficulty: int) -> tuple[bool, list[int]]:
+        """Apply techniques until no more progress is made.
+        Returns whether every cell was solved, and the candidates that were left.
+        """
+
+        (solution, candidates) = self.initial_state(givens)
+        techniques = self.techniques(difficulty)
+
+        made_progress = True
+        while made_progress:
+            made_progress = any(technique(solution, candidates) for technique in techniques)
+
+        return all(solution), candidates
+
+
+    def techniques(self, difficulty: int) -> list[Callable[[list[int], list[int]], bool]]:
+        """Techniques allowed by the difficulty, singles first."""
+
+        techniques = [self.apply_naked_singles, self.apply_hidden_singles]
+
+        if difficulty >= 2:
+            techniques += [self.apply_pointing_pairs, self.apply_box_line_reduction]
+
+        if difficulty >= 3:
+            techniques += [self.apply_naked_pairs, self.apply_naked_triples]
+
+        if difficulty >= 4:
+            techniques += [self.apply_hidden_pairs, self.apply_hidden_triples]
+
+        if difficulty >= 5:
+            techniques += [self.apply_x_wing, self.apply_swordfish, self.apply_y_wing]
+
+        return techniques
+
+
+    def eliminate(
+        self,
+        solution: list[int],
+        candidates: list[int],
+        cell_indices: Iterable[int],
+        remove_mask: int,
+        skip: Iterable[int] = (),
+    ) -> bool:
+        """Remove candidates from the unsolved cells, except the skipped ones."""
+
+        made_progress = False
+
+        for cell_index in cell_indices:
+            if solution[cell_index] or cell_index in skip:
+                continue
+
+            if candidates[cell_index] & remove_mask:
+                candidates[cell_index] &= ~remove_mask
+                made_progress = True
+
+        return made_progress
+
+
+    def number_positions(self, solution: list[int], candidates: list[int], area: list[int]) -> list[list[int]]:
+        """Unsolved cells of an area where each number can go, indexed by number."""
+
+        positions = [[] for _ in range(self.block_size + 1)]
+
+        for cell_index in area:
+            if solution[cell_index]:
+                continue
+
+            for number in numbers_from_bits(candidates[cell_index]):
+                positions[number].append(cell_index)
+
+        return positions
+
+
+    def apply_naked_singles(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for cell_index in range(self.cell_count):
+            if solution[cell_index] == 0 and candidates[cell_index].bit_count() == 1:
+                self.place(solution, candidates, cell_index, candidates[cell_index].bit_length())
+                made_progress = True
+
+        return made_progress
+
+
+    def apply_hidden_singles(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for area in self.geometry.areas:
+            positions = self.number_positions(solution, candidates, area)
+
+            for number in range(1, self.block_size + 1):
+                if len(positions[number]) == 1 and solution[positions[number][0]] == 0:
+                    self.place(solution, candidates, positions[number][0], number)
+                    made_progress = True
+
+        return made_progress
+
+
+    def apply_pointing_pairs(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+        cells = self.geometry.cells
+
+        for block in self.geometry.block_areas:
+            positions = self.number_positions(solution, candidates, block)
+
+            for number in range(1, self.block_size + 1):
+                number_cells = positions[number]
+
+                if len(number_cells) < 2:
+                    continue
+
+                bit = 1 << (number - 1)
+                first_cell = number_cells[0]
+
+                if all(cells[cell_index][0] == cells[first_cell][0] for cell_index in number_cells):
+                    for row in self.geometry.cell_rows[first_cell]:
+                        if self.eliminate(solution, candidates, self.geometry.row_areas[row], bit, number_cells):
+                            made_progress = True
+
+                if all(cells[cell_index][1] == cells[first_cell][1] for cell_index in number_cells):
+                    for col in self.geometry.cell_cols[first_cell]:
+                        if self.eliminate(solution, candidates, self.geometry.col_areas[col], bit, number_cells):
+                            made_progress = True
+
+        return made_progress
+
+
+    def apply_box_line_reduction(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for line in self.line_areas:
+            positions = self.number_positions(solution, candidates, line)
+
+            for number in range(1, self.block_size + 1):
+                number_cells = positions[number]
+
+                if len(number_cells) < 2:
+                    continue
+
+                common_blocks = set(self.geometry.cell_blocks[number_cells[0]])
+                for cell_index in number_cells[1:]:
+                    common_blocks.intersection_update(self.geometry.cell_blocks[cell_index])
+
+                for block in common_blocks:
+                    block_area = self.geometry.block_areas[block]
+                    if self.eliminate(solution, candidates, block_area, 1 << (number - 1), number_cells):
+                        made_progress = True
+
+        return made_progress
+
+
+    def apply_naked_pairs(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for area in self.geometry.areas:
+            pairs = [
+                cell_index for cell_index in area
+                if solution[cell_index] == 0 and candidates[cell_index].bit_count() == 2
+            ]
+
+            for (idx, cell_a) in enumerate(pairs):
+                for cell_b in pairs[idx + 1:]:
+                    if candidates[cell_a] != candidates[cell_b]:
+                        continue
+
+                    if self.eliminate(solution, candidates, area, candidates[cell_a], (cell_a, cell_b)):
+                        made_progress = True
+
+        return made_progress
+
+
+    def apply_naked_triples(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for area in self.geometry.areas:
+            triple_cells = [
+                cell_index for cell_index in area
+                if solution[cell_index] == 0 and 2 <= candidates[cell_index].bit_count() <= 3
+            ]
+
+            for (i, cell_a) in enumerate(triple_cells):
+                for (j, cell_b) in enumerate(triple_cells[i + 1:], i + 1):
+                    for cell_c in triple_cells[j + 1:]:
+                        union_mask = candidates[cell_a] | candidates[cell_b] | candidates[cell_c]
+
+                        if union_mask.bit_count() != 3:
+                            continue
+
+                        if self.eliminate(solution, candidates, area, union_mask, (cell_a, cell_b, cell_c)):
+                            made_progress = True
+
+        return made_progress
+
+
+    def apply_hidden_pairs(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for area in self.geometry.areas:
+            positions = self.number_positions(solution, candidates, area)
+
+            for number_a in range(1, self.block_size + 1):
+                if len(positions[number_a]) != 2:
+                    continue
+
+                for number_b in range(number_a + 1, self.block_size + 1):
+                    if positions[number_b] != positions[number_a]:
+                        continue
+
+                    keep_mask = (1 << (number_a - 1)) | (1 << (number_b - 1))
+                    if self.eliminate(solution, candidates, positions[number_a], self.full_mask & ~keep_mask):
+                        made_progress = True
+
+        return made_progress
+
+
+    def apply_hidden_triples(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for area in self.geometry.areas:
+            positions = self.number_positions(solution, candidates, area)
+            numbers = [number for number in range(1, self.block_size + 1) if 2 <= len(positions[number]) <= 3]
+
+            for (i, number_a) in enumerate(numbers):
+                for (j, number_b) in enumerate(numbers[i + 1:], i + 1):
+                    for number_c in numbers[j + 1:]:
+                        union_cells = set(positions[number_a]) | set(positions[number_b]) | set(positions[number_c])
+
+                        if len(union_cells) != 3:
+                            continue
+
+                        keep_mask = (1 << (number_a - 1)) | (1 << (number_b - 1)) | (1 << (number_c - 1))
+                        if self.eliminate(solution, candidates, union_cells, self.full_mask & ~keep_mask):
+                            made_progress = True
+
+        return made_progress
+
+
+    def cells_by_line(self, solution: list[int], candidates: list[int], bit: int, axis: int) -> list[list[int]]:
+        """Unsolved cells with a candidate, grouped by grid row (axis 0) or column (axis 1)."""
+
+        lines = {}
+
+        for (cell_index, cell) in enumerate(self.geometry.cells):
+            if solution[cell_index] == 0 and candidates[cell_index] & bit:
+                lines.setdefault(cell[axis], []).append(cell_index)
+
+        return list(lines.values())
+
+
+    def eliminate_from_common_lines(
+        self,
+        solution: list[int],
+        candidates: list[int],
+        line_cells: list[int],
+        axis: int,
+        bit: int,
+        skip: set[int],
+    ) -> bool:
+        """Remove a candidate from the row (axis 1) or column (axis 0) areas shared by the cells."""
+
+        (cell_lines, line_areas) = (
+            (self.geometry.cell_cols, self.geometry.col_areas) if axis == 0
+            else (self.geometry.cell_rows, self.geometry.row_areas)
+        )
+        common_lines = set(cell_lines[line_cells[0]])
+        for cell_index in line_cells[1:]:
+            common_lines.intersection_update(cell_lines[cell_index])
+
+        made_progress = False
+
+        for line in common_lines:
+            if self.eliminate(solution, candidates, line_areas[line], bit, skip):
+                made_progress = True
+
+        return made_progress
+
+
+    def apply_fish(self, solution: list[int], candidates: list[int], size: int) -> bool:
+        """X-Wing (size 2) and Swordfish (size 3), by rows and then by columns."""
+
+        made_progress = False
+        cells = self.geometry.cells
+
+        for number in range(1, self.block_size + 1):
+            bit = 1 << (number - 1)
+
+            for axis in (0, 1):
+                other_axis = 1 - axis
+                lines = [
+                    line for line in self.cells_by_line(solution, candidates, bit, axis)
+                    if (len(line) == 2 if size == 2 else 2 <= len(line) <= 3)
+                ]
+
+                for (i, line_a) in enumerate(lines):
+                    for (j, line_b) in enumerate(lines[i + 1:], i + 1):
+                        for line_c in (lines[j + 1:] if size == 3 else [[]]):
+                            fish_cells = line_a + line_b + line_c
+                            crossing = sorted({cells[cell_index][other_axis] for cell_index in fish_cells})
+
+                            if len(crossing) != size:
+                                continue
+
+                            if size == 2 and any(
+                                sorted(cells[cell_index][other_axis] for cell_index in line) != crossing
+                                for line in (line_a, line_b)
+                            ):
+                                continue
+
+                            skip = set(fish_cells)
+                            for position in crossing:
+                                line_cells = [
+                                    cell_index for cell_index in fish_cells
+                                    if cells[cell_index][other_axis] == position
+                                ]
+                                if self.eliminate_from_common_lines(solution, candidates, line_cells, axis, bit, skip):
+                                    made_progress = True
+
+        return made_progress
+
+
+    def apply_x_wing(self, solution: list[int], candidates: list[int]) -> bool:
+
+        return self.apply_fish(solution, candidates, 2)
+
+
+    def apply_swordfish(self, solution: list[int], candidates: list[int]) -> bool:
+
+        return self.apply_fish(solution, candidates, 3)
+
+
+    def apply_y_wing(self, solution: list[int], candidates: list[int]) -> bool:
+
+        made_progress = False
+
+        for pivot in range(self.cell_count):
+            if solution[pivot] or candidates[pivot].bit_count() != 2:
+                continue
+
+            (number_a, number_b) = numbers_from_bits(candidates[pivot])
+            (bit_a, bit_b) = (1 << (number_a - 1), 1 << (number_b - 1))
+            wings_a = []
+            wings_b = []
+
+            for peer in self.geometry.peers[pivot]:
+                if solution[peer] or candidates[peer].bit_count() != 2:
+                    continue
+
+                if candidates[peer] & bit_a and candidates[peer] & ~bit_a != bit_b:
+                    wings_a.append((peer, candidates[peer] & ~bit_a))
+
+                if candidates[peer] & bit_b and candidates[peer] & ~bit_b != bit_a:
+                    wings_b.append((peer, candidates[peer] & ~bit_b))
+
+            for (wing_a, shared_a) in wings_a:
+                for (wing_b, shared_b) in wings_b:
+                    if shared_a != shared_b or wing_a == wing_b:
+                        continue
+
+                    targets = [
+                        cell_index for cell_index in self.geometry.peers[wing_b]
+                        if cell_index in self.peer_sets[wing_a]
+                    ]
+                    if self.eliminate(solution, candidates, targets, shared_a, (pivot, wing_a, wing_b)):
+                        made_progress = True
+
+        return made_progress
+
+
+class TrailList(list):
+    """List that records the values it overwrites on a trail, so changes can be undone."""
+
+    def __init__(self, values: Iterable[int], trail: list[tuple["TrailList", int, int]]):
+        super().__init__(values)
+        self.trail = trail
+
+
+    def __setitem__(self, idx: int, value: int) -> None:
+
+        self.trail.append((self, idx, self[idx]))
+        super().__setitem__(idx, value)
+
+
+def undo_trail(trail: list[tuple[TrailList, int, int]], mark: int) -> None:
+    """Undo changes until the trail is back at the mark."""
+
+    while len(trail) > mark:
+        (values, idx, old_value) = trail.pop()
+        list.__setitem__(values, idx, old_value)
+
+
+class IncrementalRemover:
+    """Trial removals of givens from a solvable cluster, keeping solver state between them.
+
+    The candidates left by the givens alone are kept up to date, with a count per cell and number of
+    the givens ruling it out. Removing a given only changes its peers, and every change goes on an undo
+    trail. The removal is kept if the removed cell can be solved again: straight away as a single, or
+    else by applying techniques in place until it is solved. Once solved, the state holds at least what
+    the givens before the removal did, so the rest of the cluster solves as it did before. The
+    techniques' changes are then undone, as are the peers' if the cell couldn't be solved.
+
+    Singles are found by following the changes on the trail, so only the areas of changed cells are
+    looked at again. The other techniques scan the cluster as usual, when no singles are left.
+
+    This gives the same results as solving from scratch after every removal, as long as the techniques
+    reach the same result whatever order they find things in.
+    """
+
+    def __init__(self, solver: LogicSolver, givens: list[int], difficulty: int):
+        self.solver = solver
+        self.other_techniques = solver.techniques(difficulty)[2:]
+        self.trail = []
+        self.cell_areas = [
+            [solver.geometry.areas[area_idx] for area_idx in area_indices]
+            for area_indices in areas_by_cell(solver.cell_count, solver.geometry.areas)
+        ]
+
+        block_size = solver.block_size
+        eliminations = [0] * (solver.cell_count * block_size)
+
+        for (cell_index, number) in enumerate(givens):
+            if number:
+                for peer in solver.geometry.peers[cell_index]:
+                    eliminations[peer * block_size + number - 1] += 1
+
+        candidates = [
+            sum(1 << idx for idx in range(block_size) if eliminations[cell_index * block_size + idx] == 0)
+            for cell_index in range(solver.cell_count)
+        ]
+
+        self.eliminations = TrailList(eliminations, self.trail)
+        self.solution = TrailList(givens, self.trail)
+        self.candidates = TrailList(candidates, self.trail)
+
+
+    def try_remove(self, cell_index: int) -> bool:
+        """Remove a given if the cluster stays solvable without it. Returns whether it was removed."""
+
+        block_size = self.solver.block_size
+        mark = len(self.trail)
+        number = self.solution[cell_index]
+        bit = 1 << (number - 1)
+        self.solution[cell_index] = 0
+
+        for peer in self.solver.geometry.peers[cell_index]:
+            key = peer * block_size + number - 1
+            self.eliminations[key] -= 1
+
+            if self.eliminations[key] == 0:
+                self.candidates[peer] |= bit
+
+        if self.candidates[cell_index] == bit or self.find_hidden_single(cell_index, bit) == cell_index:
+            return True
+
+        removed_mark = len(self.trail)
+        solvable = self.solve_cell(cell_index)
+        undo_trail(self.trail, removed_mark if solvable else mark)
+
+        return solvable
+
+
+    def find_hidden_single(self, cell_index: int, bit: int) -> int | None:
+        """An unsolved cell that is the only place for a number in one of the areas of a cell."""
+
+        (solution, candidates) = (self.solution, self.candidates)
+
+        for area in self.cell_areas[cell_index]:
+            single = None
+
+            for other in area:
+                if candidates[other] & bit and solution[other] == 0:
+                    if single is not None:
+                        break
+                    single = other
+
+            else:
+                if single is not None:
+                    return single
+
+        return None
+
+
+    def place_hidden_singles(self) -> None:
+        """Place the hidden singles of every area, finding them with bitmasks of the numbers that can
+        go in one or more cells of the area.
+        """
+
+        (solution, candidates) = (self.solution, self.candidates)
+
+        for area in self.solver.geometry.areas:
+            (once, twice) = (0, 0)
+
+            for cell_index in area:
+                if solution[cell_index] == 0:
+                    twice |= once & candidates[cell_index]
+                    once |= candidates[cell_index]
+
+            singles = once & ~twice
+
+            while singles:
+                bit = singles & -singles
+                singles &= ~bit
+
+                for cell_index in area:
+                    if solution[cell_index] == 0 and candidates[cell_index] & bit:
+                        self.solver.place(solution, candidates, cell_index, bit.bit_length())
+                        break
+
+
+    def solve_cell(self, cell_index: int) -> bool:
+        """Apply techniques until the cell is solved, or no more progress is made."""
+
+        (solution, candidates) = (self.solution, self.candidates)
+        position = len(self.trail)
+        self.solver.apply_naked_singles(solution, candidates)
+        self.place_hidden_singles()
+
+        while solution[cell_index] == 0:
+            if position < len(self.trail):
+                position = self.follow_trail(position, cell_index)
+
+            elif not any(technique(solution, candidates) for technique in self.other_techniques):
+                break
+
+        return solution[cell_index] != 0
+
+
+    def follow_trail(self, position: int, cell_index: int) -> int:
+        """Place the singles caused by the changes on the trail from a position, and the changes those
+        placements cause in turn. Returns the position after the last change looked at.
+        """
+
+        (solution, candidates) = (self.solution, self.candidates)
+
+        while position < len(self.trail) and solution[cell_index] == 0:
+            (values, changed_cell, old_value) = self.trail[position]
+            position += 1
+
+            if values is candidates:
+                removed = old_value & ~candidates[changed_cell]
+
+                if solution[changed_cell] == 0 and candidates[changed_cell].bit_count() == 1:
+                    self.solver.place(solution, candidates, changed_cell, candidates[changed_cell].bit_length())
+
+            elif values is solution and solution[changed_cell]:
+                # A solved cell is no longer a place for its other candidates.
+                removed = candidates[changed_cell] & ~(1 << (solution[changed_cell] - 1))
+
+            else:
+                continue
+
+            while removed:
+                bit = removed & -removed
+                removed &= ~bit
+                single = self.find_hidden_single(changed_cell, bit)
+
+                if single is not None:
+                    self.solver.place(solution, candidates, single, bit.bit_length())
+
+        return position
+
+
+class PuzzleGenerator:
+    """Generates the puzzles of every cluster, see the module docstring."""
+
+    def __init__(
+        self,
+        block_size: int,
+        clusters: list[list[Cell]],
+        difficulty: int,
+        seed: int,
+        time_budget: float | None = None,
+        fallback_clusters: Iterable[int] = (),
+        on_progress: Callable[[GenerationProgress], None] | None = None,
+        cluster_ids: Iterable[int] | None = None,
+        incremental_removal: bool = True,
+    ):
+        self.block_size = block_size
+        self.clusters = [sorted(positions) for positions in clusters]
+        self.cluster_ids = list(range(1, len(self.clusters) + 1)) if cluster_ids is None else list(cluster_ids)
+        self.difficulty = difficulty
+        self.seed = seed
+        self.time_budget = time_budget
+        self.forced_fallback_clusters = set(fallback_clusters)
+        self.fallback_clusters = []
+        self.on_progress = on_progress
+        self.incremental_removal = incremental_removal
+        self.placement_rngs = {}
+
+        self.geometry = build_cluster_geometry(block_size, [pos for positions in self.clusters for pos in positions])
+        self.solution = [0] * len(self.geometry.cells)
+        self.givens = []
+
+
+    def cluster_random(self, cluster_idx: int, stage: str) -> random.Random:
+
+        return utils.cluster_random(self.seed, self.cluster_ids[cluster_idx], self.clusters[cluster_idx][0], stage)
+
+
+    def report(self, stage: str, cluster_id: int, done: int, total: int) -> None:
+
+        if self.on_progress is not None:
+            self.on_progress(GenerationProgress(stage, cluster_id, len(self.clusters), done, total))
+
+
+    def generate(self) -> GeneratedPuzzles:
+
+        self.place_numbers()
+        self.remove_givens()
+
+        return GeneratedPuzzles(
+            givens={cell: number for cell, number in zip(self.geometry.cells, self.givens) if number},
+            solution=dict(zip(self.geometry.cells, self.solution)),
+            fallback_clusters=sorted(self.fallback_clusters),
+        )
+
+
+    def cluster_cell_indices(self, positions: list[Cell]) -> list[int]:
+        """Global cell indices of a cluster, in local geometry order."""
+
+        return [self.geometry.cell_indices[cell] for cell in build_cluster_geometry(self.block_size, positions).cells]
+
+
+    def place_numbers(self) -> None:
+        """Fill every cluster in order, going back to the previous cluster when one can't be filled."""
+
+        remaining = deque(range(len(self.clusters)))
+        history = []
+        first_cluster_retries = 0
+
+        while remaining:
+            cluster_idx = remaining.popleft()
+            previous_solution = self.solution.copy()
+
+            try:
+                self.place_numbers_in_cluster(cluster_idx)
+                history.append((previous_solution, cluster_idx))
+
+            except GenerationError as e:
+                if not history:
+                    if isinstance(e, BacktrackLimitError) and first_cluster_retries < max_first_cluster_retries:
+                        first_cluster_retries += 1
+                        remaining.appendleft(cluster_idx)
+                        continue
+
+                    raise
+
+                (previous_solution, previous_idx) = history.pop()
+                self.solution = previous_solution
+                remaining.appendleft(cluster_idx)
+                remaining.appendleft(previous_idx)
+                continue
+
+            self.report("placing", self.cluster_ids[cluster_idx], len(history), len(self.clusters))
+
+
+    def place_numbers_in_cluster(self, cluster_idx: int) -> None:
+
+        # Retries continue the cluster's stream instead of starting it again.
+        rng = self.placement_rngs.setdefault(cluster_idx, self.cluster_random(cluster_idx, "place"))
+        cluster_geometry = build_cluster_geometry(self.block_size, self.clusters[cluster_idx])
+        cell_indices = [self.geometry.cell_indices[cell] for cell in cluster_geometry.cells]
+        cluster_areas = [[cell_indices[idx] for idx in area] for area in cluster_geometry.areas]
+        cluster_cells = set(cell_indices)
+
+        # Candidates of the cluster cells and their peers, from everything placed so far.
+        full_mask = (1 << self.block_size) - 1
+        candidates = {}
+
+        for cell_index in cluster_cells.union(*(self.geometry.peers[idx] for idx in cell_indices)):
+            mask = full_mask
+            for peer in self.geometry.peers[cell_index]:
+                if self.solution[peer]:
+                    mask &= ~(1 << (self.solution[peer] - 1))
+            candidates[cell_index] = mask
+
+        counter = [0]
+
+        if not self.solve_with_backtracking(cell_indices, cluster_cells, cluster_areas, candidates, rng, counter):
+            if counter[0] >= backtrack_limit:
+                raise BacktrackLimitError()
+            raise GenerationError("Failed to place numbers in cluster")
+
+
+    def solve_with_backtracking(
+        self,
+        cell_indices: list[int],
+        cluster_cells: set[int],
+        cluster_areas: list[list[int]],
+        candidates: dict[int, int],
+        rng: random.Random,
+        counter: list[int],
+    ) -> bool:
+
+        if counter[0] >= backtrack_limit:
+            return False
+
+        best_cell = find_best_cell((idx for idx in cell_indices if self.solution[idx] == 0), candidates)
+
+        if best_cell is None:
+            return True
+
+        numbers = numbers_from_bits(candidates[best_cell])
+        rng.shuffle(numbers)
+
+        for number in numbers:
+            self.solution[best_cell] = number
+            changes = self.propagate_chained(best_cell, number, cluster_cells, cluster_areas, candidates)
+
+            if changes is None:
+                self.solution[best_cell] = 0
+                continue
+
+            if self.solve_with_backtracking(cell_indices, cluster_cells, cluster_areas, candidates, rng, counter):
+                return True
+
+            counter[0] += 1
+            self.revert(changes, candidates)
+            self.solution[best_cell] = 0
+
+        return False
+
+
+    def propagate_chained(
+        self,
+        cell_index: int,
+        number: int,
+        cluster_cells: set[int],
+        cluster_areas: list[list[int]],
+        candidates: dict[int, int],
+    ) -> tuple[list[tuple[int, int]], list[int]] | None:
+        """Remove a placed number from its peers and place naked and hidden singles in the cluster
+        that follow from it, like propagateChained in the client. Returns the changes, or None with
+        the changes reverted on a contradiction.
+        """
+
+        changes = ([], [])
+        queue = [(cell_index, number)]
+        found_hidden_single = True
+
+        try:
+            while found_hidden_single:
+                found_hidden_single = False
+
+                while queue:
+                    (idx, num) = queue.pop()
+                    bit = 1 << (num - 1)
+
+                    for peer in self.geometry.peers[idx]:
+                        if not candidates[peer] & bit:
+                            continue
+
+                        new_mask = candidates[peer] & ~bit
+                        if new_mask == 0:
+                            raise Contradiction()
+
+                        changes[0].append((peer, candidates[peer]))
+                        candidates[peer] = new_mask
+
+                        if self.solution[peer] == 0 and peer in cluster_cells and new_mask.bit_count() == 1:
+                            self.solution[peer] = new_mask.bit_length()
+                            changes[1].append(peer)
+                            queue.append((peer, new_mask.bit_length()))
+
+                for area in cluster_areas:
+                    for num in range(1, self.block_size + 1):
+                        bit = 1 << (num - 1)
+                        unsolved = [idx for idx in area if self.solution[idx] == 0 and candidates[idx] & bit]
+
+                        if not unsolved:
+                            if not any(self.solution[idx] == num for idx in area):
+                                raise Contradiction()
+                            continue
+
+                        if len(unsolved) != 1:
+                            continue
+
+                        forced = unsolved[0]
+                        if candidates[forced] != bit:
+                            changes[0].append((forced, candidates[forced]))
+                            candidates[forced] = bit
+
+                        self.solution[forced] = num
+                        changes[1].append(forced)
+                        queue.append((forced, num))
+                        found_hidden_single = True
+
+        except Contradiction:
+            self.revert(changes, candidates)
+            return None
+
+        return changes
+
+
+    def revert(self, changes: tuple[list[tuple[int, int]], list[int]], candidates: dict[int, int]) -> None:
+
+        for idx in changes[1]:
+            self.solution[idx] = 0
+
+        for (idx, mask) in reversed(changes[0]):
+            candidates[idx] = mask
+
+
+    def remove_givens(self) -> None:
+        """Remove givens cluster by cluster. Cells shared with earlier clusters are left as they are."""
+
+        self.givens = self.solution.copy()
+        remaining_cells = set(range(len(self.geometry.cells)))
+
+        for (cluster_idx, positions) in enumerate(self.clusters):
+            cluster_id = self.cluster_ids[cluster_idx]
+            cluster_geometry = build_cluster_geometry(self.block_size, positions)
+            cell_indices = [self.geometry.cell_indices[cell] for cell in cluster_geometry.cells]
+            removable = [idx for (idx, cell_index) in enumerate(cell_indices) if cell_index in remaining_cells]
+            remaining_cells.difference_update(cell_indices)
+
+            solver = LogicSolver(cluster_geometry)
+            initial_givens = [self.givens[cell_index] for cell_index in cell_indices]
+            deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+
+            if cluster_id in self.forced_fallback_clusters:
+                givens = self.remove_cluster_givens(cluster_idx, solver, initial_givens, removable, fallback_difficulty)
+                self.fallback_clusters.append(cluster_id)
+
+            else:
+                try:
+                    givens = self.remove_cluster_givens(
+                        cluster_idx, solver, initial_givens, removable, self.difficulty, deadline,
+                    )
+
+                except BudgetExceeded:
+                    givens = self.remove_cluster_givens(
+                        cluster_idx, solver, initial_givens, removable, fallback_difficulty,
+                    )
+                    self.fallback_clusters.append(cluster_id)
+
+            for (cell_index, number) in zip(cell_indices, givens):
+                self.givens[cell_index] = number
+
+
+    def remove_cluster_givens(
+        self,
+        cluster_idx: int,
+        solver: LogicSolver,
+        initial_givens: list[int],
+        removable: list[int],
+        difficulty: int,
+        deadline: float | None = None,
+    ) -> list[int]:
+        """Remove as many givens as possible while the cluster stays solvable at the difficulty, like
+        removeGivenNumbers in the client. Returns the cluster givens in local cell order.
+        """
+
+        cluster_id = self.cluster_ids[cluster_idx]
+        rng = self.cluster_random(cluster_idx, "remove")
+        solution = [self.solution[self.geometry.cell_indices[cell]] for cell in solver.geometry.cells]
+        givens = list(initial_givens)
+        to_remove = [idx for idx in removable if givens[idx]]
+        rng.shuffle(to_remove)
+        original_to_remove = list(to_remove)
+
+        # Restore givens until the cluster is solvable, it might not be because of cells shared with
+        # clusters that already had givens removed.
+        while True:
+            (solvable, candidates) = solver.solve(givens, difficulty)
+            if solvable:
+                break
+
+            restore = find_best_cell((idx for idx in range(len(givens)) if givens[idx] == 0), candidates)
+            givens[restore] = solution[restore]
+
+        retry_count = 0
+
+        while True:
+            remover = IncrementalRemover(solver, givens, difficulty) if self.incremental_removal else None
+
+            for (attempt, cell_index) in enumerate(to_remove):
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise BudgetExceeded()
+
+                self.report("removing", cluster_id, attempt, len(to_remove))
+
+                if remover is not None:
+                    if remover.try_remove(cell_index):
+                        givens[cell_index] = 0
+                    continue
+
+                givens[cell_index] = 0
+
+                if not solver.solve(givens, difficulty)[0]:
+                    givens[cell_index] = solution[cell_index]
+
+            # Retry if the cluster can be solved at a lower difficulty.
+            threshold = difficulty - (1 if retry_count < max_difficulty_retries // 2 else 2)
+
+            if retry_count >= max_difficulty_retries or threshold <= 0:
+                break
+
+            if not solver.solve(givens, threshold)[0]:
+                break
+
+            retry_count += 1
+            for cell_index in original_to_remove:
+                givens[cell_index] = solution[cell_index]
+
+            to_remove = list(original_to_remove)
+            rng.shuffle(to_remove)
+
+        self.report("removing", cluster_id, len(to_remove), len(to_remove))
+
+        return givens
+
+
+def generate_puzzles(
+    block_size: int,
+    clusters: list[list[Cell]],
+    difficulty: int,
+    seed: int,
+    time_budget: float | None = None,
+    fallback_clusters: Iterable[int] = (),
+    on_progress: Callable[[GenerationProgress], None] | None = None,
+    cluster_ids: Iterable[int] | None = None,
+) -> GeneratedPuzzles:
+    """Generate givens and solution for every cluster.
+
+    `time_budget` is the number of seconds each cluster may spend removing givens before falling back.
+    Clusters in `fallback_clusters` fall back without trying, which reproduces an earlier run from its
+    recorded `GeneratedPuzzles.fallback_clusters`. `cluster_ids` are the slot data ids of the clusters
+    and default to numbering them from 1, pass them when generating only some of the clusters.
+    """
+
+    generator = PuzzleGenerator(
+        block_size,
+        clusters,
+        difficulty,
+        seed,
+        time_budget=time_budget,
+        fallback_clusters=fallback_clusters,
+        on_progress=on_progress,
+        cluster_ids=cluster_ids,
+    )
+
+    return generator.generate()
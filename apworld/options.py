@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 import Options
 
+from . import utils
+
 
 class BlockSize(Options.Choice):
     """The size of a single block (and the width/height of each board)."""
@@ -30,13 +32,13 @@ class BoardsPerCluster(Options.Choice):
 
 class NumberOfBoards(Options.Range):
     """How many boards to generate. Maximum depend on block size:
-    - 4-9: 100 boards
-    - 12: 64 boards
-    - 16: 36 boards
+    - 4-9: The end of the range
+    - 12: 64% of the end of the range
+    - 16: 36% of the end of the range
     """
     display_name = "Number of Boards"
     range_start = 3
-    range_end = 100
+    range_end = utils.max_number_of_boards
     default = 5
 
 
@@ -81,6 +83,33 @@ class DuplicateProgression(Options.Range):
     default = 0
 
 
+class BlockBalancing(Options.Choice):
+    """Which block items take part in progression balancing. Does not change logic.
+    - Full: All block items are balanced.
+    - Reduced: Duplicate block items skip progression balancing, the first copy of each block is still
+      balanced. Recommended for large games with Duplicate Progression Items, as balancing all of them
+      can make generation slow. Only applies to Shuffled block unlocks.
+    """
+    display_name = "Block Balancing"
+    option_full = "full"
+    option_reduced = "reduced"
+    default = "full"
+
+
+class BlockFillOrder(Options.Choice):
+    """The order block items are placed in during fill. Does not change logic.
+    - Shuffled: Block items are placed in a random order, like any other item.
+    - Unlock Order: Block items are placed from the last to the first block in the unlock order, so each
+      block is placed while the blocks before it can still be assumed. Keeps early blocks in early
+      spheres and can reduce fill retries in games with many Archipeladoku slots. Only applies to
+      Shuffled block unlocks.
+    """
+    display_name = "Block Fill Order"
+    option_shuffled = "shuffled"
+    option_unlock_order = "unlock_order"
+    default = "shuffled"
+
+
 class LocationScouting(Options.Choice):
     """How scouting of locations is handled.
     - Auto: Locations are scouted automatically when fully revealed.
@@ -177,6 +206,8 @@ class ArchipeladokuOptions(Options.PerGameCommonOptions):
     difficulty: Difficulty
     progression: Progression
     duplicate_progression: DuplicateProgression
+    block_balancing: BlockBalancing
+    block_fill_order: BlockFillOrder
     location_scouting: LocationScouting
     solve_selected_cell_ratio: SolveSelectedCellRatio
     solve_random_cell_ratio: SolveRandomCellRatio
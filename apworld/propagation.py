@@ -0,0 +1,268 @@
+"""Candidate propagation for whole clusters.
+
+Cells of a cluster are numbered locally, and candidates are stored as one bitmask per cell, bit n - 1
+set if n is still possible, the same representation as the client generator. `ClusterGeometry` holds
+the precomputed peer and area index arrays for a cluster, built from the same geometry as
+`utils.build_blocks`.
+
+`VectorizedPropagator` applies naked and hidden singles to every cell of every board in the cluster at once using
+NumPy, which is an optional dependency. `propagate_per_cell` does the same one cell at a time in plain
+Python, like `applyNakedSingles`/`applyHiddenSingles` in the client generator, and is kept as the
+reference implementation.
+"""
+
+from dataclasses import dataclass
+
+from . import utils
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Contradiction(Exception):
+    pass
+
+
+@dataclass
+class ClusterGeometry:
+    block_size: int
+    cells: list[tuple[int, int]]
+    cell_indices: dict[tuple[int, int], int]
+    areas: list[list[int]]
+    peers: list[list[int]]
+    block_areas: list[list[int]]
+    row_areas: list[list[int]]
+    col_areas: list[list[int]]
+    # Indices into block_areas, row_areas and col_areas of the areas each cell is part of.
+    cell_blocks: list[list[int]]
+    cell_rows: list[list[int]]
+    cell_cols: list[list[int]]
+
+
+def build_cluster_geometry(block_size: int, positions: list[tuple[int, int]]) -> ClusterGeometry:
+    """Build local cell numbering, areas and peers for the boards of a cluster."""
+
+    [ block_rows, block_cols ] = utils.block_size_to_dimensions(block_size)
+    cell_set = set()
+    block_cells = set()
+    row_cells = set()
+    col_cells = set()
+
+    for (board_row, board_col) in sorted(positions):
+        for row in range(block_size):
+            for col in range(block_size):
+                cell_set.add((board_row + row, board_col + col))
+
+        for (block_row, block_col) in utils.build_blocks(block_size, (board_row, board_col)):
+            block_cells.add(tuple(
+                (block_row + row, block_col + col)
+                for row in range(block_rows)
+                for col in range(block_cols)
+            ))
+
+        for offset in range(block_size):
+            row_cells.add(tuple((board_row + offset, board_col + col) for col in range(block_size)))
+            col_cells.add(tuple((board_row + row, board_col + offset) for row in range(block_size)))
+
+    cells = sorted(cell_set)
+    cell_indices = {cell: idx for idx, cell in enumerate(cells)}
+    areas = [[cell_indices[cell] for cell in area] for area in sorted(block_cells | row_cells | col_cells)]
+    block_areas = [[cell_indices[cell] for cell in area] for area in sorted(block_cells)]
+    row_areas = [[cell_indices[cell] for cell in area] for area in sorted(row_cells)]
+    col_areas = [[cell_indices[cell] for cell in area] for area in sorted(col_cells)]
+    peer_sets = [set() for _ in cells]
+
+    for area in areas:
+        for cell_index in area:
+            peer_sets[cell_index].update(area)
+
+    peers = [sorted(peer_set - {idx}) for idx, peer_set in enumerate(peer_sets)]
+
+    return ClusterGeometry(
+        block_size=block_size,
+        cells=cells,
+        cell_indices=cell_indices,
+        areas=areas,
+        peers=peers,
+        block_areas=block_areas,
+        row_areas=row_areas,
+        col_areas=col_areas,
+        cell_blocks=areas_by_cell(len(cells), block_areas),
+        cell_rows=areas_by_cell(len(cells), row_areas),
+        cell_cols=areas_by_cell(len(cells), col_areas),
+    )
+
+
+def areas_by_cell(cell_count: int, areas: list[list[int]]) -> list[list[int]]:
+    """Indices of the areas each cell is part of."""
+
+    cell_areas = [[] for _ in range(cell_count)]
+
+    for area_index, area in enumerate(areas):
+        for cell_index in area:
+            cell_areas[cell_index].append(area_index)
+
+    return cell_areas
+
+
+def propagate_per_cell(geometry: ClusterGeometry, givens: dict[tuple[int, int], int]) -> dict[tuple[int, int], int]:
+    """Apply naked and hidden singles one cell at a time until no more progress is made.
+    Returns the (possibly partial) solution, with 0 for unsolved cells.
+    """
+
+    block_size = geometry.block_size
+    solution = [givens.get(cell, 0) for cell in geometry.cells]
+    candidates = [(1 << block_size) - 1] * len(geometry.cells)
+
+    def place(cell_index: int, number: int) -> None:
+        bit = 1 << (number - 1)
+        solution[cell_index] = number
+        candidates[cell_index] = bit
+
+        for peer in geometry.peers[cell_index]:
+            if candidates[peer] & bit:
+                candidates[peer] &= ~bit
+
+                if candidates[peer] == 0:
+                    raise Contradiction()
+
+    for cell_index, number in enumerate(solution):
+        if number:
+            place(cell_index, number)
+
+    made_progress = True
+    while made_progress:
+        made_progress = False
+
+        for cell_index, possibilities in enumerate(candidates):
+            if solution[cell_index] == 0 and possibilities.bit_count() == 1:
+                place(cell_index, possibilities.bit_length())
+                made_progress = True
+
+        for area in geometry.areas:
+            for number in range(1, block_size + 1):
+                bit = 1 << (number - 1)
+                count = 0
+                position = -1
+
+                for cell_index in area:
+                    if solution[cell_index] == number:
+                        count = -1
+                        break
+
+                    if solution[cell_index] == 0 and candidates[cell_index] & bit:
+                        count += 1
+                        position = cell_index
+
+                if count == 0:
+                    raise Contradiction()
+
+                if count == 1:
+                    place(position, number)
+                    made_progress = True
+
+    return {cell: number for cell, number in zip(geometry.cells, solution)}
+
+
+def build_bit_count_table():
+    """Bit count lookup for NumPy versions without bitwise_count. Block sizes fit in 16 bits."""
+
+    table = np.zeros(1 << 16, dtype=np.int32)
+    for bit in range(16):
+        table[1 << bit:1 << (bit + 1)] = table[:1 << bit] + 1
+
+    return lambda values: table[values]
+
+
+class VectorizedPropagator:
+    """Naked and hidden singles applied to a whole cluster per step with NumPy."""
+
+    def __init__(self, geometry: ClusterGeometry):
+        if np is None:
+            raise ImportError("NumPy is required for vectorized propagation")
+
+        self.bit_count = np.bitwise_count if hasattr(np, "bitwise_count") else build_bit_count_table()
+        self.geometry = geometry
+        self.block_size = geometry.block_size
+        self.cell_count = len(geometry.cells)
+        self.full_mask = (1 << self.block_size) - 1
+        self.bits = np.left_shift(1, np.arange(self.block_size, dtype=np.int32))
+        self.areas = np.array(geometry.areas, dtype=np.int32)
+
+        # Peer lists are padded with an extra sentinel cell that is always empty with no candidates.
+        max_peers = max(len(peers) for peers in geometry.peers)
+        self.peers = np.full((self.cell_count, max_peers), self.cell_count, dtype=np.int32)
+        for cell_index, peers in enumerate(geometry.peers):
+            self.peers[cell_index, :len(peers)] = peers
+
+
+    def initial_state(self, givens: dict[tuple[int, int], int]) -> tuple["np.ndarray", "np.ndarray"]:
+        """Build solution and candidate arrays, including the sentinel cell, from givens."""
+
+        solution = np.zeros(self.cell_count + 1, dtype=np.int32)
+        for cell, number in givens.items():
+            solution[self.geometry.cell_indices[cell]] = number
+
+        candidates = np.full(self.cell_count + 1, self.full_mask, dtype=np.int32)
+        candidates[-1] = 0
+
+        return solution, candidates
+
+
+    def step(self, solution: "np.ndarray", candidates: "np.ndarray") -> int:
+        """Eliminate candidates seen by solved peers, then place every naked and hidden single.
+        Updates the arrays in place and returns the number of placed cells.
+        """
+
+        solved_bits = np.where(solution > 0, np.left_shift(1, np.maximum(solution - 1, 0)), 0)
+        peer_solved = np.bitwise_or.reduce(solved_bits[self.peers], axis=1)
+        unsolved = solution[:-1] == 0
+
+        if np.any(solved_bits[:-1] & peer_solved):
+            raise Contradiction()
+
+        candidates[:-1] = np.where(unsolved, candidates[:-1] & ~peer_solved, solved_bits[:-1])
+
+        if np.any(candidates[:-1] == 0):
+            raise Contradiction()
+
+        # Naked singles: unsolved cells with a single candidate left.
+        assigned = np.where(unsolved & (self.bit_count(candidates[:-1]) == 1), candidates[:-1], 0)
+
+        # Hidden singles: numbers missing from an area that fit in exactly one of its unsolved cells.
+        area_solution = solution[self.areas]
+        area_candidates = np.where(area_solution == 0, candidates[self.areas], 0)
+        presence = (area_candidates[:, :, np.newaxis] & self.bits) != 0
+        counts = presence.sum(axis=1)
+        placed = (np.bitwise_or.reduce(solved_bits[self.areas], axis=1)[:, np.newaxis] & self.bits) != 0
+
+        if np.any((counts == 0) & ~placed):
+            raise Contradiction()
+
+        (area_idx, number_idx) = np.nonzero((counts == 1) & ~placed)
+        hidden_cells = self.areas[area_idx, presence[area_idx, :, number_idx].argmax(axis=1)]
+        np.bitwise_or.at(assigned, hidden_cells, self.bits[number_idx])
+
+        if np.any(self.bit_count(assigned) > 1):
+            raise Contradiction()
+
+        new_cells = np.nonzero(assigned)[0]
+        solution[new_cells] = self.bit_count(assigned[new_cells] - 1) + 1
+        candidates[new_cells] = assigned[new_cells]
+
+        return len(new_cells)
+
+
+    def propagate(self, givens: dict[tuple[int, int], int]) -> dict[tuple[int, int], int]:
+        """Apply steps until no more progress is made.
+        Returns the (possibly partial) solution, with 0 for unsolved cells.
+        """
+
+        (solution, candidates) = self.initial_state(givens)
+
+        while self.step(solution, candidates) > 0:
+            pass
+
+        return {cell: int(number) for cell, number in zip(self.geometry.cells, solution[:-1])}
@@ -0,0 +1,66 @@
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable
+
+from BaseClasses import CollectionState
+
+
+Rule = Callable[[CollectionState], bool]
+
+
+@dataclass
+class RuleStats:
+    evaluations: int = 0
+    seconds: float = 0.0
+    true_results: int = 0
+
+
+class RuleProfiler:
+    """Counts evaluations, time and results of access rules, grouped by kind of rule."""
+
+    def __init__(self):
+        self.stats: dict[str, RuleStats] = defaultdict(RuleStats)
+
+
+    def wrap(self, kind: str, rule: Rule) -> Rule:
+        """Wrap a rule so its evaluations are counted under the kind."""
+
+        stats = self.stats[kind]
+
+        def profiled_rule(state: CollectionState) -> bool:
+            started = time.perf_counter()
+            result = rule(state)
+            stats.seconds += time.perf_counter() - started
+            stats.evaluations += 1
+
+            if result:
+                stats.true_results += 1
+
+            return result
+
+        return profiled_rule
+
+
+    def report(self, player_name: str) -> str:
+        """Report of the rule kinds, most expensive first."""
+
+        total_evaluations = sum(stats.evaluations for stats in self.stats.values())
+        total_seconds = sum(stats.seconds for stats in self.stats.values())
+        lines = [
+            f"Archipeladoku: Access rules for {player_name}: {total_evaluations} evaluations"
+            f" in {total_seconds * 1000:.1f}ms"
+        ]
+
+        for (kind, stats) in sorted(self.stats.items(), key=lambda item: -item[1].seconds):
+            if stats.evaluations == 0:
+                lines.append(f"  {kind}: never evaluated")
+                continue
+
+            lines.append(
+                f"  {kind}: {stats.evaluations} evaluations, {stats.seconds * 1000:.1f}ms"
+                f" ({stats.seconds / stats.evaluations * 1e6:.2f}us each),"
+                f" {stats.true_results} true, {stats.evaluations - stats.true_results} false"
+            )
+
+        return "\n".join(lines)
@@ -1,3 +1,6 @@
+import functools
+import hashlib
+import itertools
 import math
 import random
 import importlib.resources
@@ -12,6 +15,51 @@ class Cluster:
     positions: set[tuple[int, int]]
 
 
+@dataclass
+class GenerationCost:
+    seconds: float
+    locations: int
+    items: int
+
+
+@dataclass
+class GenerationCounts:
+    boards: int
+    blocks: int
+    rows: int
+    columns: int
+    progression_items: int
+    duplicate_progression_count: int
+    filler_counts: dict[str, int]
+
+    @property
+    def locations(self) -> int:
+        return self.boards + self.blocks + self.rows + self.columns
+
+    @property
+    def items(self) -> int:
+        return self.progression_items + self.duplicate_progression_count + sum(self.filler_counts.values())
+
+
+@dataclass
+class GenerationData:
+    clusters: dict[int, Cluster]
+    block_unlock_order: list[tuple[int, int]]
+    duplicate_progression_count: int
+    filler_counts: dict[str, int]
+
+
+@dataclass
+class FillerSampler:
+    names: list[str]
+    cum_weights: list[int]
+
+    def sample(self, rng: random.Random, count: int) -> list[str]:
+        """Draw filler names, the same as count calls to rng.choices with the weights."""
+
+        return rng.choices(self.names, cum_weights=self.cum_weights, k=count)
+
+
 def block_size_to_dimensions(block_size: int) -> (int, int):
     """Convert block size to board dimensions (rows, columns)."""
 
@@ -45,15 +93,15 @@ def get_number_of_boards(block_size: int, number_of_boards: int) -> int:
 
 
 def get_max_number_of_boards(block_size: int) -> int:
-    """Calculate the maximum number of boards."""
+    """Calculate the maximum number of boards, limited by the locations registered in locations.txt."""
 
     match block_size:
-        case 4: return 100
-        case 6: return 100
-        case 8: return 100
-        case 9: return 100
-        case 12: return 64
-        case 16: return 36
+        case 4: return max_number_of_boards
+        case 6: return max_number_of_boards
+        case 8: return max_number_of_boards
+        case 9: return max_number_of_boards
+        case 12: return max_number_of_boards * 64 // 100
+        case 16: return max_number_of_boards * 36 // 100
 
 
 def get_total_filler_count(block_size: int, number_of_boards: int) -> int:
@@ -70,7 +118,8 @@ def get_total_filler_count(block_size: int, number_of_boards: int) -> int:
 def get_filler_counts(options, duplicate_progression_count: int) -> dict[str, int]:
     """Calculate the count per filler item."""
 
-    total_fillers = get_total_filler_count(options.block_size.value, options.number_of_boards.value)
+    number_of_boards = get_number_of_boards(options.block_size.value, options.number_of_boards.value)
+    total_fillers = get_total_filler_count(options.block_size.value, number_of_boards)
     total_fillers -= duplicate_progression_count
 
     ratios = {
@@ -85,7 +134,7 @@ def get_filler_counts(options, duplicate_progression_count: int) -> dict[str, in
 
     for key, ratio in ratios.items():
         if ratio > 0:
-            fillers[key] = math.ceil(options.number_of_boards.value * (ratio / 100.0))
+            fillers[key] = math.ceil(number_of_boards * (ratio / 100.0))
 
     current_total = sum(fillers.values())
 
@@ -100,7 +149,7 @@ def get_filler_counts(options, duplicate_progression_count: int) -> dict[str, in
         for _ in range(to_add):
             best_key = max(
                 fillers.keys(),
-                key=lambda k: (ratios[k] - (fillers[k] * 100.0 / options.number_of_boards.value))
+                key=lambda k: (ratios[k] - (fillers[k] * 100.0 / number_of_boards))
             )
             fillers[best_key] += 1
 
@@ -110,6 +159,100 @@ def get_filler_counts(options, duplicate_progression_count: int) -> dict[str, in
     return fillers
 
 
+def get_filler_weights(options) -> dict[str, int]:
+    """Weights for drawing extra filler items."""
+
+    weights = {
+        "Solve Selected Cell": options.solve_selected_cell_ratio.value,
+        "Solve Random Cell": options.solve_random_cell_ratio.value,
+        "Remove Random Candidate": options.remove_random_candidate_ratio.value,
+        "Emoji Trap": options.emoji_trap_ratio.value,
+        "Disco Trap": options.disco_trap_ratio.value,
+        "Tunnel Vision Trap": options.tunnel_vision_trap_ratio.value,
+        "Nothing": get_nothing_weight(options),
+    }
+
+    if all(weight == 0 for weight in weights.values()):
+        weights["Nothing"] = 1
+
+    return weights
+
+
+def get_nothing_weight(options) -> int:
+    """Weight of Nothing among the extra filler items, lower the more useful filler is enabled."""
+
+    weight = options.block_size.value * 200 + 100 \
+        - options.solve_selected_cell_ratio.value \
+        - options.solve_random_cell_ratio.value \
+        - options.remove_random_candidate_ratio.value \
+
+    return max(0, weight)
+
+
+def build_filler_sampler(weights: dict[str, int]) -> FillerSampler:
+    """Precompute cumulative weights, so drawing doesn't need to rebuild them."""
+
+    return FillerSampler(names=list(weights.keys()), cum_weights=list(itertools.accumulate(weights.values())))
+
+
+def estimate_generation_cost(options) -> GenerationCost:
+    """Estimate the client puzzle generation time and the location and item counts for a player."""
+
+    block_size = options.block_size.value
+    number_of_boards = get_number_of_boards(block_size, options.number_of_boards.value)
+    counts = get_generation_counts(options)
+    ms = generation_ms_per_board[block_size][options.difficulty.value] * number_of_boards
+
+    return GenerationCost(
+        seconds=ms / 1000.0,
+        locations=counts.locations,
+        items=counts.items,
+    )
+
+
+def get_generation_counts(options) -> GenerationCounts:
+    """Calculate location and item counts for a set of options, without generating a world."""
+
+    block_size = options.block_size.value
+    number_of_boards = get_number_of_boards(block_size, options.number_of_boards.value)
+    block_count = count_blocks(block_size, options.boards_per_cluster.value, number_of_boards)
+    progression_items = block_count - block_size # Initial blocks are not items
+    duplicate_progression_count = progression_items * options.duplicate_progression.value // 100
+
+    return GenerationCounts(
+        boards=number_of_boards,
+        blocks=block_count,
+        rows=number_of_boards * block_size,
+        columns=number_of_boards * block_size,
+        progression_items=progression_items,
+        duplicate_progression_count=duplicate_progression_count,
+        filler_counts=get_filler_counts(options, duplicate_progression_count),
+    )
+
+
+def count_blocks(block_size: int, boards_per_cluster: int, number_of_boards: int) -> int:
+    """Count the distinct blocks of all boards, shared blocks counted once."""
+
+    # Clusters are laid out apart from each other, so only blocks within a cluster can be shared.
+    full_clusters = number_of_boards // boards_per_cluster
+    remaining_boards = number_of_boards % boards_per_cluster
+    count = full_clusters * count_cluster_blocks(block_size, boards_per_cluster)
+
+    if remaining_boards > 0:
+        count += count_cluster_blocks(block_size, remaining_boards)
+
+    return count
+
+
+@functools.cache
+def count_cluster_blocks(block_size: int, number_of_boards: int) -> int:
+    """Count the distinct blocks of the boards in a single cluster."""
+
+    positions = position_boards_in_cluster(block_size, number_of_boards)
+
+    return len(set(block for pos in positions for block in build_blocks(block_size, pos)))
+
+
 def position_boards(block_size: int, boards_per_cluster: int, number_of_boards: int) -> list[tuple[int, int]]:
     """Calculate positions for each board in the puzzle."""
 
@@ -250,9 +393,51 @@ def build_blocks(block_size: int, board_position: tuple[int, int]) -> set[tuple[
 
 
 def group_positions(block_size: int, positions: list[tuple[int, int]]) -> dict[int, list[tuple[int, int]]]:
-    """Group board positions into clusters based on block size."""
+    """Group board positions into clusters of boards that share blocks."""
+
+    parents = list(range(len(positions)))
+    block_boards = {}
+
+    def find(idx: int) -> int:
+        while parents[idx] != idx:
+            parents[idx] = parents[parents[idx]]
+            idx = parents[idx]
+        return idx
+
+    for idx, pos in enumerate(positions):
+        for block in build_blocks(block_size, pos):
+            other_idx = block_boards.setdefault(block, idx)
+            root = find(idx)
+            other_root = find(other_idx)
+
+            # Keep the lowest index as root so clusters are numbered in board order.
+            if root != other_root:
+                parents[max(root, other_root)] = min(root, other_root)
+
+    groups = {}
+    for idx, pos in enumerate(positions):
+        groups.setdefault(find(idx), []).append(pos)
+
+    return {cluster_id: group for cluster_id, group in enumerate(groups.values(), start=1)}
 
-    return dict([(idx + 1, [pos]) for idx, pos in enumerate(positions)])  # Placeholder implementation
+
+def build_clusters(block_size: int, positions: list[tuple[int, int]]) -> dict[int, Cluster]:
+    """Build one cluster per board, numbered in board order.
+
+    Boards are unlocked and generated one at a time, group_positions groups the boards that share blocks
+    where that matters.
+    """
+
+    clusters = {}
+
+    for idx, pos in enumerate(positions, start=1):
+        clusters[idx] = Cluster(
+            id=idx,
+            blocks=build_blocks(block_size, pos),
+            positions={pos},
+        )
+
+    return clusters
 
 
 def build_block_unlock_order(
@@ -265,7 +450,6 @@ def build_block_unlock_order(
 
     filler_count = get_total_filler_count(block_size, number_of_boards)
     fillers = set([(-i, -i) for i in range(1, filler_count + 1)])
-    assigned_blocks = set()
     remaining_blocks = set([block for cluster in clusters.values() for block in cluster.blocks])
     block_order_clusters = build_block_order_clusters(block_size, clusters)
     credits = block_size
@@ -302,10 +486,9 @@ def build_block_unlock_order(
             remaining_blocks.update(fillers)
             fillers = set()
 
-        assigned_blocks.update(target_blocks_to_add)
         del block_order_clusters[target.id]
         for cluster in block_order_clusters.values():
-            cluster.blocks.difference_update(assigned_blocks)
+            cluster.blocks.difference_update(target_blocks_to_add)
 
     order = [block for block in order if block[0] >= 0]
 
@@ -357,6 +540,115 @@ def calculate_cluster_unlock_requirements(
     return cluster_requirements
 
 
+def cluster_seed(seed: int, cluster_id: int, position: tuple[int, int], stage: str) -> int:
+    """Derive the seed of a cluster's random stream for a generation stage from the `seed` slot data.
+
+    The seed is the first 8 bytes, read little-endian, of the SHA-256 digest of the UTF-8 string
+    "archipeladoku:{seed}:{stage}:{cluster_id}:{row}:{col}". The stage is "place" for placing numbers and
+    "remove" for removing givens, the cluster id is numbered from 1 like the `clusters` slot data, and
+    (row, col) is the cluster's first board position. Streams don't depend on each other, so a cluster
+    gets the same numbers whichever order clusters are generated in, and removal doesn't replay the
+    numbers placement drew.
+    """
+
+    (row, col) = position
+    digest = hashlib.sha256(f"archipeladoku:{seed}:{stage}:{cluster_id}:{row}:{col}".encode("utf-8")).digest()
+
+    return int.from_bytes(digest[:8], "little")
+
+
+def cluster_random(seed: int, cluster_id: int, position: tuple[int, int], stage: str) -> random.Random:
+    """Random stream of a cluster for a generation stage, see cluster_seed."""
+
+    return random.Random(cluster_seed(seed, cluster_id, position, stage))
+
+
+def build_generation_data(options, seed: int) -> GenerationData:
+    """Compute the per-player data needed by generate_early for a fresh seed.
+    Only depends on the options and the seed, so tools can build the same data outside of a multiworld.
+    """
+
+    rng = random.Random(seed)
+    block_size = options.block_size.value
+    number_of_boards = get_number_of_boards(block_size, options.number_of_boards.value)
+
+    board_positions = position_boards(
+        block_size,
+        options.boards_per_cluster.value,
+        number_of_boards,
+    )
+
+    clusters = build_clusters(block_size, board_positions)
+
+    block_unlock_order = build_block_unlock_order(
+        block_size,
+        number_of_boards,
+        clusters,
+        rng,
+    )
+
+    initial_unlock_count = block_size
+    progression_items = len(block_unlock_order) - initial_unlock_count
+    duplicate_progression_count = progression_items * options.duplicate_progression.value // 100
+
+    return GenerationData(
+        clusters=clusters,
+        block_unlock_order=block_unlock_order,
+        duplicate_progression_count=duplicate_progression_count,
+        filler_counts=get_filler_counts(options, duplicate_progression_count),
+    )
+
+
+# Milliseconds per board for the client puzzle generator, by block size and difficulty. Boards per cluster
+# doesn't change it, boards are generated one at a time. Generated with tools/calibrate_cost_model.py.
+generation_ms_per_board = {
+    4: {1: 4, 2: 10, 3: 16, 4: 20, 5: 32},
+    6: {1: 9, 2: 22, 3: 32, 4: 39, 5: 84},
+    8: {1: 19, 2: 36, 3: 59, 4: 105, 5: 162},
+    9: {1: 23, 2: 40, 3: 62, 4: 139, 5: 214},
+    12: {1: 50, 2: 70, 3: 106, 4: 251, 5: 443},
+    16: {1: 109, 2: 189, 3: 265, 4: 468, 5: 1380},
+}
+
+
+def build_block_location_index(
+    block_size: int,
+    clusters: dict[int, Cluster],
+    block_unlock_order: list[tuple[int, int]],
+) -> tuple[list[int], list[int]]:
+    """Index the locations each block takes part in, for every block in the unlock order.
+
+    Returns (offsets, location_ids): the sorted location ids for the block at position i in the unlock order
+    are location_ids[offsets[i]:offsets[i + 1]]. This covers the block itself, every row and column passing
+    through it and every board containing it.
+    """
+
+    [ block_rows, block_cols ] = block_size_to_dimensions(block_size)
+    block_locations = defaultdict(set)
+
+    for cluster in clusters.values():
+        for (board_row, board_col) in cluster.positions:
+            for (row, col) in build_blocks(block_size, (board_row, board_col)):
+                locations = block_locations[(row, col)]
+                locations.add(block_id(row, col))
+                locations.add(board_id(board_row, board_col))
+                locations.update(row_id(row + offset, board_col) for offset in range(block_rows))
+                locations.update(col_id(board_row, col + offset) for offset in range(block_cols))
+
+    offsets = [0]
+    location_ids = []
+
+    for block in block_unlock_order:
+        location_ids.extend(sorted(block_locations[block]))
+        offsets.append(len(location_ids))
+
+    return (offsets, location_ids)
+
+
+# Ids encode the row and column in three digits each, which fits 500 boards of every block size.
+max_coordinate = 999
+
+
 def block_id(row: int, col: int) -> int:
     return 1000000 + row * 1000 + col
 
@@ -393,6 +685,15 @@ def board_name(row: int, col: int) -> str:
     return f"Solve Board {row_to_label(row)}{col}"
 
 
+def location_name(location_id: int) -> str:
+    """Name of a block, row, column or board location from its id."""
+
+    (kind, row, col) = (location_id // 1000000, location_id // 1000 % 1000, location_id % 1000)
+
+    return [block_name, row_name, col_name, board_name][kind - 1](row, col)
+
+
+@functools.cache
 def row_to_label(row: int) -> str:
     chars = [
         'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'J', 'K', 'L', 'M',
@@ -443,28 +744,41 @@ location_name_groups = {
 }
 
 locations_path = importlib.resources.files(__package__).joinpath("locations.txt")
+(checksum_line, _, locations_text) = locations_path.read_text(encoding="utf-8").partition("\n")
+
+# locations.txt is generated by tools/build_locations.py from the reachable option space.
+if checksum_line != f"# sha256 {hashlib.sha256(locations_text.encode('utf-8')).hexdigest()}":
+    raise ValueError("locations.txt does not match its checksum, regenerate it with tools/build_locations.py")
+
 valid_locations = {
-    int(line) for line in locations_path.read_text(encoding="utf-8").splitlines()
-    if line.strip()
+    int(line) for line in locations_text.splitlines()
+    if line.strip() and not line.startswith("#")
 }
 
-max_width = 170
-for row in range(1, max_width + 1):
-    for col in range(1, max_width + 1):
-        if block_id(row, col) in valid_locations:
-            item_name_to_id[block_item_name(row, col)] = block_id(row, col)
-            item_name_groups["Blocks"].add(block_item_name(row, col))
-            location_name_to_id[block_name(row, col)] = block_id(row, col)
-            location_name_groups["Blocks"].add(block_name(row, col))
-
-        if row_id(row, col) in valid_locations:
-            location_name_to_id[row_name(row, col)] = row_id(row, col)
-            location_name_groups["Rows"].add(row_name(row, col))
-
-        if col_id(row, col) in valid_locations:
-            location_name_to_id[col_name(row, col)] = col_id(row, col)
-            location_name_groups["Columns"].add(col_name(row, col))
-
-        if board_id(row, col) in valid_locations:
-            location_name_to_id[board_name(row, col)] = board_id(row, col)
-            location_name_groups["Boards"].add(board_name(row, col))
+# The number of boards locations.txt was built for, larger grids need a build with more locations.
+max_number_of_boards = next(
+    int(line.removeprefix("# max_number_of_boards "))
+    for line in locations_text.splitlines()
+    if line.startswith("# max_number_of_boards ")
+)
+
+for location_id in sorted(valid_locations):
+    (kind, row, col) = (location_id // 1000000, location_id // 1000 % 1000, location_id % 1000)
+
+    if kind == 1:
+        item_name_to_id[block_item_name(row, col)] = location_id
+        item_name_groups["Blocks"].add(block_item_name(row, col))
+        location_name_to_id[block_name(row, col)] = location_id
+        location_name_groups["Blocks"].add(block_name(row, col))
+
+    elif kind == 2:
+        location_name_to_id[row_name(row, col)] = location_id
+        location_name_groups["Rows"].add(row_name(row, col))
+
+    elif kind == 3:
+        location_name_to_id[col_name(row, col)] = location_id
+        location_name_groups["Columns"].add(col_name(row, col))
+
+    elif kind == 4:
+        location_name_to_id[board_name(row, col)] = location_id
+        location_name_groups["Boards"].add(board_name(row, col))
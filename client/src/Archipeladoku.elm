@@ -3576,14 +3576,29 @@ maxBoardWidth =
     180
 
 
+wideBoardWidth : Int
+wideBoardWidth =
+    1000
+
+
 packCoordinate : ( Int, Int ) -> Int
 packCoordinate ( row, col ) =
-    row * maxBoardWidth + col
+    -- Columns past maxBoardWidth are packed as negative numbers, so saves from before larger grids
+    -- still unpack the same.
+    if col < maxBoardWidth then
+        row * maxBoardWidth + col
+
+    else
+        negate (row * wideBoardWidth + col)
 
 
 unpackCoordinate : Int -> ( Int, Int )
 unpackCoordinate packedCoordinate =
-    ( packedCoordinate // maxBoardWidth, modBy maxBoardWidth packedCoordinate )
+    if packedCoordinate < 0 then
+        ( negate packedCoordinate // wideBoardWidth, modBy wideBoardWidth (negate packedCoordinate) )
+
+    else
+        ( packedCoordinate // maxBoardWidth, modBy maxBoardWidth packedCoordinate )
 
 
 packCellValue : Maybe CellValue -> Int
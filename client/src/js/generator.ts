@@ -29,6 +29,13 @@ type PeerMap = number[][]
 type PossibilitiesMap = Int32Array
 
 
+// Cell arrays cover the grid of one generation, from row and column 1 to the last board's far edge.
+interface Grid {
+    width: number
+    size: number
+}
+
+
 type GenerateArgs = GenerateLocalArgs | GenerateServerArgs
 
 
@@ -152,6 +159,7 @@ interface ClusterGenerationState {
     difficulty: number
     firstClusterRetries: number
     givens: Int32Array
+    grid: Grid
     puzzleAreas: PuzzleAreas
     peerMap: PeerMap
     rng: () => number
@@ -177,8 +185,6 @@ interface PropagationChanges {
 class BacktrackLimitError extends Error {}
 
 
-const maxWidth: number = 180 // Enough to cover all supported configurations
-const totalArraySize: number = maxWidth * maxWidth
 const backtrackLimit = 5000
 const maxFirstClusterRetries = 10
 
@@ -212,24 +218,26 @@ export function initGeneration(args: GenerateArgs): BoardGenerationState {
         ? args.clusters.reduce((acc, cluster) => acc.concat(cluster), [])
         : positionBoards(args.blockSize, args.boardsPerCluster, numberOfBoards)
 
+    const grid: Grid = getGrid(args.blockSize, positions)
+
     const boardPuzzleAreas: PuzzleAreas[] = []
     for (const [startRow, startCol] of positions) {
         const puzzleAreas = buildPuzzleAreasForBoard(args.blockSize, startRow, startCol)
         boardPuzzleAreas.push(puzzleAreas)
     }
-    const puzzleAreas: PuzzleAreas = joinPuzzleAreas(boardPuzzleAreas)
+    const puzzleAreas: PuzzleAreas = joinPuzzleAreas(grid, boardPuzzleAreas)
     const areas: Area[] = [...puzzleAreas.blocks, ...puzzleAreas.rows, ...puzzleAreas.cols]
-    const cellAreaIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(areas)
-    const cellBlockIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(puzzleAreas.blocks)
-    const cellRowIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(puzzleAreas.rows)
-    const cellColIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(puzzleAreas.cols)
+    const cellAreaIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(grid, areas)
+    const cellBlockIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(grid, puzzleAreas.blocks)
+    const cellRowIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(grid, puzzleAreas.rows)
+    const cellColIndicesMap: CellIndex[][][] = buildCellAreaIndicesMap(grid, puzzleAreas.cols)
     const cells: Set<Cell> = new Set()
     const cellIndices: Set<CellIndex> = new Set()
 
     for (const board of puzzleAreas.boards) {
         const boardCells: Cell[] = getCellsInArea(board)
         for (const [row, col] of boardCells) {
-            const cellIndex: CellIndex = getCellIndex(row, col)
+            const cellIndex: CellIndex = getCellIndex(grid, row, col)
             cells.add([row, col])
             cellIndices.add(cellIndex)
         }
@@ -237,7 +245,7 @@ export function initGeneration(args: GenerateArgs): BoardGenerationState {
 
     if (args.seed == 422011699) { args.seed = 422011700 }
     const rng: () => number = createRandomGenerator(args.seed)
-    const peerMap: PeerMap = buildPeerMap(cells, cellAreaIndicesMap)
+    const peerMap: PeerMap = buildPeerMap(grid, cells, cellAreaIndicesMap)
     const clusters: Cell[][] = "clusters" in args
         ? args.clusters
         : buildClusters(positions, rng)
@@ -245,6 +253,7 @@ export function initGeneration(args: GenerateArgs): BoardGenerationState {
         ? [args.blockUnlockOrder, new Map()]
         : buildUnlocks(
             args,
+            grid,
             puzzleAreas.blocks,
             clusters,
             rng
@@ -264,13 +273,14 @@ export function initGeneration(args: GenerateArgs): BoardGenerationState {
             cellRowIndicesMap: cellRowIndicesMap,
             cellIndicesToRemoveGivensFrom: new Set(cellIndices),
             difficulty: args.difficulty,
-            givens: new Int32Array(totalArraySize),
+            givens: new Int32Array(grid.size),
+            grid: grid,
             puzzleAreas: puzzleAreas,
             peerMap: peerMap,
             firstClusterRetries: 0,
             rng: rng,
             remainingClusters: clusters.slice(),
-            solution: new Int32Array(totalArraySize),
+            solution: new Int32Array(grid.size),
             solutionHistory: [],
         },
     }
@@ -459,7 +469,7 @@ function buildPuzzleAreasForBoard(blockSize: number, startRow: number, startCol:
 }
 
 
-function joinPuzzleAreas(puzzleAreasList: PuzzleAreas[]): PuzzleAreas {
+function joinPuzzleAreas(grid: Grid, puzzleAreasList: PuzzleAreas[]): PuzzleAreas {
     const boards: Map<number, Area> = new Map()
     const blocks: Map<number, Area> = new Map()
     const rows: Map<number, Area> = new Map()
@@ -467,19 +477,19 @@ function joinPuzzleAreas(puzzleAreasList: PuzzleAreas[]): PuzzleAreas {
 
     for (const puzzleAreas of puzzleAreasList) {
         for (const board of puzzleAreas.boards) {
-            const key = getCellIndex(board.startRow, board.startCol)
+            const key = getCellIndex(grid, board.startRow, board.startCol)
             boards.set(key, board)
         }
         for (const block of puzzleAreas.blocks) {
-            const key = getCellIndex(block.startRow, block.startCol)
+            const key = getCellIndex(grid, block.startRow, block.startCol)
             blocks.set(key, block)
         }
         for (const row of puzzleAreas.rows) {
-            const key = getCellIndex(row.startRow, row.startCol)
+            const key = getCellIndex(grid, row.startRow, row.startCol)
             rows.set(key, row)
         }
         for (const col of puzzleAreas.cols) {
-            const key = getCellIndex(col.startRow, col.startCol)
+            const key = getCellIndex(grid, col.startRow, col.startCol)
             cols.set(key, col)
         }
     }
@@ -493,11 +503,11 @@ function joinPuzzleAreas(puzzleAreasList: PuzzleAreas[]): PuzzleAreas {
 }
 
 
-function buildCellAreaIndicesMap(areas: Area[]): CellIndex[][][] {
-    const map: CellIndex[][][] = Array.from({ length: totalArraySize }, () => [])
+function buildCellAreaIndicesMap(grid: Grid, areas: Area[]): CellIndex[][][] {
+    const map: CellIndex[][][] = Array.from({ length: grid.size }, () => [])
 
     for (const area of areas) {
-        const cellIndices: CellIndex[] = getCellIndicesInArea(area)
+        const cellIndices: CellIndex[] = getCellIndicesInArea(grid, area)
         for (const cellIndex of cellIndices) {
             map[cellIndex]!.push(cellIndices)
         }
@@ -519,11 +529,11 @@ function getCellsInArea(area: Area): Cell[] {
 }
 
 
-function getCellIndicesInArea(area: Area): CellIndex[] {
+function getCellIndicesInArea(grid: Grid, area: Area): CellIndex[] {
     const cellIndices: CellIndex[] = []
     for (let r = area.startRow; r <= area.endRow; r++) {
         for (let c = area.startCol; c <= area.endCol; c++) {
-            const cellIndex: CellIndex = getCellIndex(r, c)
+            const cellIndex: CellIndex = getCellIndex(grid, r, c)
             cellIndices.push(cellIndex)
         }
     }
@@ -532,11 +542,11 @@ function getCellIndicesInArea(area: Area): CellIndex[] {
 }
 
 
-function buildPeerMap(cells: Set<Cell>, cellAreaIndicesMap: CellIndex[][][]): PeerMap {
-    const peerMap: PeerMap = Array.from({ length: totalArraySize }, () => [])
+function buildPeerMap(grid: Grid, cells: Set<Cell>, cellAreaIndicesMap: CellIndex[][][]): PeerMap {
+    const peerMap: PeerMap = Array.from({ length: grid.size }, () => [])
 
     for (const [row, col] of cells) {
-        const cellIndex: CellIndex = getCellIndex(row, col)
+        const cellIndex: CellIndex = getCellIndex(grid, row, col)
         const areas: CellIndex[][] = cellAreaIndicesMap[cellIndex]!
         const peerSet: Set<number> = new Set()
 
@@ -563,6 +573,7 @@ function buildClusters(positions: Cell[], rng: () => number): Cell[][] {
 
 function buildUnlocks(
     args: GenerateLocalArgs,
+    grid: Grid,
     allBlocks: Area[],
     clusters: Cell[][],
     rng: () => number,
@@ -575,7 +586,7 @@ function buildUnlocks(
     const clusterOrder: UnlockMapCluster[] = []
 
     for (const block of allBlocks) {
-        const key = getCellIndex(block.startRow, block.startCol)
+        const key = getCellIndex(grid, block.startRow, block.startCol)
         remainingBlocks.set(key, [block.startRow, block.startCol])
     }
 
@@ -593,7 +604,7 @@ function buildUnlocks(
             let boardAreas = buildPuzzleAreasForBoard(args.blockSize, startRow, startCol)
 
             for (const block of boardAreas.blocks) {
-                const blockKey = getCellIndex(block.startRow, block.startCol)
+                const blockKey = getCellIndex(grid, block.startRow, block.startCol)
                 unlockMapCluster.blocks.set(blockKey, [block.startRow, block.startCol])
                 const blockId = cellToBlockId(block.startRow, block.startCol)
                 unlockMapCluster.locations.set(blockId, { id: blockId, weight: 1 })
@@ -922,22 +933,23 @@ export function generate(boardState: BoardGenerationState): BoardGenerationState
 
 function placeNumbersInCluster(cluster: Cell[], state: ClusterGenerationState): void {
     const possibilitiesMap: PossibilitiesMap = createPossibilitiesMap(
+        state.grid,
         state.blockSize,
         state.peerMap,
         state.allCellIndices,
         state.solution
     )
 
-    const clusterCellIndices: Set<CellIndex> = getClusterCellIndices(state.blockSize, cluster)
+    const clusterCellIndices: Set<CellIndex> = getClusterCellIndices(state.grid, state.blockSize, cluster)
 
     const clusterAreasList: PuzzleAreas[] = []
     for (const [startRow, startCol] of cluster) {
         clusterAreasList.push(buildPuzzleAreasForBoard(state.blockSize, startRow, startCol))
     }
-    const clusterPuzzleAreas: PuzzleAreas = joinPuzzleAreas(clusterAreasList)
+    const clusterPuzzleAreas: PuzzleAreas = joinPuzzleAreas(state.grid, clusterAreasList)
     const clusterAreaIndices: CellIndex[][] = []
     for (const area of [...clusterPuzzleAreas.blocks, ...clusterPuzzleAreas.rows, ...clusterPuzzleAreas.cols]) {
-        clusterAreaIndices.push(getCellIndicesInArea(area))
+        clusterAreaIndices.push(getCellIndicesInArea(state.grid, area))
     }
 
     const counter = { count: 0 }
@@ -960,12 +972,13 @@ function placeNumbersInCluster(cluster: Cell[], state: ClusterGenerationState):
 
 
 function createPossibilitiesMap(
+    grid: Grid,
     blockSize: number,
     peerMap: PeerMap,
     cellIndices: Set<CellIndex>,
     solution: Int32Array,
 ): PossibilitiesMap {
-    const possibilitiesMap: PossibilitiesMap = new Int32Array(totalArraySize)
+    const possibilitiesMap: PossibilitiesMap = new Int32Array(grid.size)
 
     for (const cellIndex of cellIndices) {
         possibilitiesMap[cellIndex] = (1 << blockSize) - 1
@@ -1169,13 +1182,13 @@ function propagateChained(
 }
 
 
-function getClusterCellIndices(blockSize: number, cluster: Cell[]): Set<CellIndex> {
+function getClusterCellIndices(grid: Grid, blockSize: number, cluster: Cell[]): Set<CellIndex> {
     const clusterCellIndices: Set<CellIndex> = new Set()
 
     for (const [startRow, startCol] of cluster) {
         for (let r = 0; r < blockSize; r++) {
             for (let c = 0; c < blockSize; c++) {
-                const cellIndex: CellIndex = getCellIndex(startRow + r, startCol + c)
+                const cellIndex: CellIndex = getCellIndex(grid, startRow + r, startCol + c)
                 clusterCellIndices.add(cellIndex)
             }
         }
@@ -1284,7 +1297,7 @@ function findBestCell(candidateCells: CellIndex[], possibilitiesMap: Possibiliti
 
 
 function removeGivenNumbers(cluster: Cell[], state: ClusterGenerationState): void {
-    const clusterCellIndices: Set<CellIndex> = getClusterCellIndices(state.blockSize, cluster)
+    const clusterCellIndices: Set<CellIndex> = getClusterCellIndices(state.grid, state.blockSize, cluster)
 
     const cellsToRemoveFrom: Set<CellIndex> = intersectSets(
         clusterCellIndices,
@@ -1306,25 +1319,25 @@ function removeGivenNumbers(cluster: Cell[], state: ClusterGenerationState): voi
 
     const originalIndicesToRemove = [...indicesToRemove]
 
-    const solutionBuffer: Int32Array = new Int32Array(totalArraySize)
+    const solutionBuffer: Int32Array = new Int32Array(state.grid.size)
 
     const clusterAreasList: PuzzleAreas[] = []
     for (const [row, col] of cluster) {
         clusterAreasList.push(buildPuzzleAreasForBoard(state.blockSize, row, col))
     }
-    const clusterPuzzleAreas: PuzzleAreas = joinPuzzleAreas(clusterAreasList)
+    const clusterPuzzleAreas: PuzzleAreas = joinPuzzleAreas(state.grid, clusterAreasList)
     const clusterAreaIndices: CellIndex[][] = []
     const clusterBlockIndices: CellIndex[][] = []
     const clusterLineIndices: CellIndex[][] = []
 
     for (const area of [...clusterPuzzleAreas.blocks, ...clusterPuzzleAreas.rows, ...clusterPuzzleAreas.cols]) {
-        clusterAreaIndices.push(getCellIndicesInArea(area))
+        clusterAreaIndices.push(getCellIndicesInArea(state.grid, area))
     }
     for (const area of clusterPuzzleAreas.blocks) {
-        clusterBlockIndices.push(getCellIndicesInArea(area))
+        clusterBlockIndices.push(getCellIndicesInArea(state.grid, area))
     }
     for (const area of [...clusterPuzzleAreas.rows, ...clusterPuzzleAreas.cols]) {
-        clusterLineIndices.push(getCellIndicesInArea(area))
+        clusterLineIndices.push(getCellIndicesInArea(state.grid, area))
     }
 
     // Restore givens until we reach a solvable state (might be unsolvable due to overlapping clusters).
@@ -1332,6 +1345,7 @@ function removeGivenNumbers(cluster: Cell[], state: ClusterGenerationState): voi
         solutionBuffer.set(state.givens)
 
         const possibilitiesMap: PossibilitiesMap = createPossibilitiesMap(
+            state.grid,
             state.blockSize,
             state.peerMap,
             clusterCellIndices,
@@ -1373,6 +1387,7 @@ function removeGivenNumbers(cluster: Cell[], state: ClusterGenerationState): voi
             solutionBuffer.set(state.givens)
 
             const possibilitiesMap: PossibilitiesMap = createPossibilitiesMap(
+                state.grid,
                 state.blockSize,
                 state.peerMap,
                 clusterCellIndices,
@@ -1404,6 +1419,7 @@ function removeGivenNumbers(cluster: Cell[], state: ClusterGenerationState): voi
 
         solutionBuffer.set(state.givens)
         const possibilitiesMap: PossibilitiesMap = createPossibilitiesMap(
+            state.grid,
             state.blockSize,
             state.peerMap,
             clusterCellIndices,
@@ -1606,8 +1622,8 @@ function applyPointingPairs(
             }
 
             const firstCellIndex = numberCells[0]!
-            const firstRow = Math.floor(firstCellIndex / maxWidth)
-            const allSameRow = numberCells.every(cellIndex => Math.floor(cellIndex / maxWidth) === firstRow)
+            const firstRow = Math.floor(firstCellIndex / state.grid.width)
+            const allSameRow = numberCells.every(cellIndex => Math.floor(cellIndex / state.grid.width) === firstRow)
 
             if (allSameRow) {
                 const rows: CellIndex[][] = state.cellRowIndicesMap[firstCellIndex]!
@@ -1634,8 +1650,8 @@ function applyPointingPairs(
                 }
             }
 
-            const firstCol = numberCells[0]! % maxWidth
-            const allSameCol = numberCells.every(cellIndex => cellIndex % maxWidth === firstCol)
+            const firstCol = numberCells[0]! % state.grid.width
+            const allSameCol = numberCells.every(cellIndex => cellIndex % state.grid.width === firstCol)
 
             if (allSameCol) {
                 const cols: CellIndex[][] = state.cellColIndicesMap[firstCellIndex]!
@@ -2054,7 +2070,7 @@ function applyXWing(
             if (!(possibilitiesMap[cellIndex]! & bit)) {
                 continue
             }
-            const row = Math.floor(cellIndex / maxWidth)
+            const row = Math.floor(cellIndex / state.grid.width)
             let rowCells = byRow.get(row)
             if (!rowCells) {
                 rowCells = []
@@ -2074,14 +2090,14 @@ function applyXWing(
             for (let j = i + 1; j < rowsWithTwoCandidates.length; j++) {
                 let [row1CellA, row1CellB] = rowsWithTwoCandidates[i]!
                 let [row2CellA, row2CellB] = rowsWithTwoCandidates[j]!
-                if (row1CellA % maxWidth > row1CellB % maxWidth) {
+                if (row1CellA % state.grid.width > row1CellB % state.grid.width) {
                     const temp = row1CellA; row1CellA = row1CellB; row1CellB = temp
                 }
-                if (row2CellA % maxWidth > row2CellB % maxWidth) {
+                if (row2CellA % state.grid.width > row2CellB % state.grid.width) {
                     const temp = row2CellA; row2CellA = row2CellB; row2CellB = temp
                 }
-                if (row1CellA % maxWidth !== row2CellA % maxWidth
-                    || row1CellB % maxWidth !== row2CellB % maxWidth) {
+                if (row1CellA % state.grid.width !== row2CellA % state.grid.width
+                    || row1CellB % state.grid.width !== row2CellB % state.grid.width) {
                     continue
                 }
 
@@ -2122,7 +2138,7 @@ function applyXWing(
             if (!(possibilitiesMap[cellIndex]! & bit)) {
                 continue
             }
-            const col = cellIndex % maxWidth
+            const col = cellIndex % state.grid.width
             let colCells = byCol.get(col)
             if (!colCells) {
                 colCells = []
@@ -2142,14 +2158,14 @@ function applyXWing(
             for (let j = i + 1; j < colsWithTwoCandidates.length; j++) {
                 let [col1CellA, col1CellB] = colsWithTwoCandidates[i]!
                 let [col2CellA, col2CellB] = colsWithTwoCandidates[j]!
-                if (Math.floor(col1CellA / maxWidth) > Math.floor(col1CellB / maxWidth)) {
+                if (Math.floor(col1CellA / state.grid.width) > Math.floor(col1CellB / state.grid.width)) {
                     const temp = col1CellA; col1CellA = col1CellB; col1CellB = temp
                 }
-                if (Math.floor(col2CellA / maxWidth) > Math.floor(col2CellB / maxWidth)) {
+                if (Math.floor(col2CellA / state.grid.width) > Math.floor(col2CellB / state.grid.width)) {
                     const temp = col2CellA; col2CellA = col2CellB; col2CellB = temp
                 }
-                if (Math.floor(col1CellA / maxWidth) !== Math.floor(col2CellA / maxWidth)
-                    || Math.floor(col1CellB / maxWidth) !== Math.floor(col2CellB / maxWidth)) {
+                if (Math.floor(col1CellA / state.grid.width) !== Math.floor(col2CellA / state.grid.width)
+                    || Math.floor(col1CellB / state.grid.width) !== Math.floor(col2CellB / state.grid.width)) {
                     continue
                 }
 
@@ -2207,7 +2223,7 @@ function applySwordfish(
             if (!(possibilitiesMap[cellIndex]! & bit)) {
                 continue
             }
-            const row = Math.floor(cellIndex / maxWidth)
+            const row = Math.floor(cellIndex / state.grid.width)
             let rowCells = byRow.get(row)
             if (!rowCells) {
                 rowCells = []
@@ -2231,7 +2247,7 @@ function applySwordfish(
                     const colSet = new Set<number>()
                     for (const row of rowTriple) {
                         for (const cellIndex of row) {
-                            colSet.add(cellIndex % maxWidth)
+                            colSet.add(cellIndex % state.grid.width)
                         }
                     }
 
@@ -2243,7 +2259,7 @@ function applySwordfish(
                     const swordfishCells = new Set(allRowCells)
 
                     for (const lockedCol of colSet) {
-                        const cellsInCol = allRowCells.filter(cellIndex => cellIndex % maxWidth === lockedCol)
+                        const cellsInCol = allRowCells.filter(cellIndex => cellIndex % state.grid.width === lockedCol)
                         let colLines = [...state.cellColIndicesMap[cellsInCol[0]!]!]
                         for (let idx = 1; idx < cellsInCol.length; idx++) {
                             colLines = colLines.filter(
@@ -2279,7 +2295,7 @@ function applySwordfish(
             if (!(possibilitiesMap[cellIndex]! & bit)) {
                 continue
             }
-            const col = cellIndex % maxWidth
+            const col = cellIndex % state.grid.width
             let colCells = byCol.get(col)
             if (!colCells) {
                 colCells = []
@@ -2303,7 +2319,7 @@ function applySwordfish(
                     const rowSet = new Set<number>()
                     for (const col of colTriple) {
                         for (const cellIndex of col) {
-                            rowSet.add(Math.floor(cellIndex / maxWidth))
+                            rowSet.add(Math.floor(cellIndex / state.grid.width))
                         }
                     }
 
@@ -2316,7 +2332,7 @@ function applySwordfish(
 
                     for (const lockedRow of rowSet) {
                         const cellsInRow = allColCells.filter(
-                            cellIndex => Math.floor(cellIndex / maxWidth) === lockedRow
+                            cellIndex => Math.floor(cellIndex / state.grid.width) === lockedRow
                         )
                         let rowLines = [...state.cellRowIndicesMap[cellsInRow[0]!]!]
                         for (let idx = 1; idx < cellsInRow.length; idx++) {
@@ -2445,7 +2461,7 @@ function clusterStateToCompleted(state: ClusterGenerationState): Completed {
     const unlockMap: [number, number][] = []
 
     for (let [row, col] of state.allCells) {
-        const cellIndex: CellIndex = getCellIndex(row, col)
+        const cellIndex: CellIndex = getCellIndex(state.grid, row, col)
         const number: number = state.solution[cellIndex]!
 
         solution.push([row, col, number])
@@ -2530,8 +2546,16 @@ function shuffleArray<T>(array: T[], rng: () => number): void {
 }
 
 
-function getCellIndex(row: number, col: number): CellIndex {
-    return (row - 1) * maxWidth + (col - 1)
+function getGrid(blockSize: number, positions: Cell[]): Grid {
+    const height: number = Math.max(...positions.map(([row]) => row)) + blockSize - 1
+    const width: number = Math.max(...positions.map(([, col]) => col)) + blockSize - 1
+
+    return { width: width, size: height * width }
+}
+
+
+function getCellIndex(grid: Grid, row: number, col: number): CellIndex {
+    return (row - 1) * grid.width + (col - 1)
 }
 
 
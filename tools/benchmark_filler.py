@@ -0,0 +1,104 @@
+"""Benchmark drawing extra filler items.
+
+Compares rebuilding the filler weights on every draw, as get_filler_item_name used to, with the cached
+sampler drawing one item per call and a batch at once. All three draw from the same seed and must give
+the same items, which is checked before timing.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/benchmark_filler.py --count 50000
+"""
+
+import argparse
+import random
+import time
+import types
+
+import benchmark_large_grids
+import build_locations
+
+
+def build_options(block_size: int) -> types.SimpleNamespace:
+    """Options with every filler kind enabled."""
+
+    options = benchmark_large_grids.build_options(block_size, 1, 100)
+
+    for (name, ratio) in [
+        ("solve_selected_cell_ratio", 10),
+        ("solve_random_cell_ratio", 20),
+        ("remove_random_candidate_ratio", 30),
+        ("emoji_trap_ratio", 5),
+        ("disco_trap_ratio", 5),
+        ("tunnel_vision_trap_ratio", 5),
+    ]:
+        setattr(options, name, types.SimpleNamespace(value=ratio))
+
+    return options
+
+
+def draw_rebuilding(utils, options, rng: random.Random, count: int) -> list[str]:
+
+    names = []
+
+    for _ in range(count):
+        weights = utils.get_filler_weights(options)
+        names.append(rng.choices(list(weights.keys()), weights=list(weights.values()))[0])
+
+    return names
+
+
+def draw_cached(utils, options, rng: random.Random, count: int) -> list[str]:
+
+    sampler = utils.build_filler_sampler(utils.get_filler_weights(options))
+
+    return [sampler.sample(rng, 1)[0] for _ in range(count)]
+
+
+def draw_batched(utils, options, rng: random.Random, count: int) -> list[str]:
+
+    sampler = utils.build_filler_sampler(utils.get_filler_weights(options))
+
+    return sampler.sample(rng, count)
+
+
+def timed(method, utils, options, count: int) -> float:
+
+    rng = random.Random(1)
+    started = time.perf_counter()
+    method(utils, options, rng, count)
+
+    return time.perf_counter() - started
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark drawing extra filler items.")
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--block-size", type=int, default=9)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    utils = build_locations.load_utils()
+    options = build_options(args.block_size)
+    methods = [
+        ("rebuilding weights", draw_rebuilding),
+        ("cached sampler", draw_cached),
+        ("cached sampler, batched", draw_batched),
+    ]
+
+    expected = draw_rebuilding(utils, options, random.Random(1), args.count)
+    for (name, method) in methods[1:]:
+        if method(utils, options, random.Random(1), args.count) != expected:
+            raise ValueError(f"{name} draws different items")
+
+    for (name, method) in methods:
+        best = min(
+            timed(method, utils, options, args.count)
+            for _ in range(args.repeat)
+        )
+        print(f"{name}: {args.count} fillers in {best * 1000:.1f}ms ({best / args.count * 1e6:.2f}us each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Benchmark multiworld generation with many Archipeladoku slots.
+
+Writes one player YAML per slot and runs Archipelago's generator in a fresh process for each variant,
+timing the main fill and progression balancing separately from the total, and counting fill sweeps.
+Variants are sets of option overrides, so the same seeds can be compared with and without a setting.
+Fill retries depend a lot on the seed, so every variant runs each seed and the median is reported next
+to the per-seed counts.
+
+Requires an Archipelago checkout with the apworld linked into worlds/archipeladoku, as in the deploy
+workflow.
+
+Example:
+    python tools/benchmark_generation.py --archipelago ../Archipelago --players 20 \\
+        --option number_of_boards=100 --option progression=shuffled --option duplicate_progression=100 \\
+        --variant full:block_balancing=full --variant reduced:block_balancing=reduced
+    python tools/benchmark_generation.py --archipelago ../Archipelago --players 50 --seeds 1 2 3 4 5 \\
+        --option number_of_boards=50 --option progression=shuffled \\
+        --variant shuffled:block_fill_order=shuffled --variant unlock_order:block_fill_order=unlock_order
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+driver_source = """
+import json
+import sys
+import time
+from collections import defaultdict
+
+player_files_path, seed = sys.argv[1:3]
+sys.argv = [
+    "Generate.py",
+    "--player_files_path", player_files_path,
+    "--outputpath", player_files_path,
+    "--seed", seed,
+    "--skip_output",
+]
+
+import Fill
+import Generate
+import Main
+
+timings = defaultdict(float)
+
+# Fill sweeps the remaining pool once per placement and again for every swap attempt, so the count
+# goes up with fill retries.
+original_sweep_from_pool = Fill.sweep_from_pool
+
+def counted_sweep_from_pool(*args, **kwargs):
+    timings["sweeps"] += 1
+    return original_sweep_from_pool(*args, **kwargs)
+
+Fill.sweep_from_pool = counted_sweep_from_pool
+
+for name in ("distribute_items_restrictive", "balance_multiworld_progression"):
+    original = getattr(Fill, name)
+
+    def timed(*args, original=original, name=name, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            timings[name] += time.perf_counter() - started
+
+    setattr(Fill, name, timed)
+    if hasattr(Main, name):
+        setattr(Main, name, timed)
+
+started = time.perf_counter()
+erargs, seed = Generate.main()
+Main.main(erargs, seed)
+timings["total"] = time.perf_counter() - started
+
+print(json.dumps(timings))
+"""
+
+
+def write_player_files(directory: pathlib.Path, players: int, player_options: dict[str, str]) -> None:
+    """Write one YAML per Archipeladoku slot."""
+
+    for player in range(1, players + 1):
+        lines = [f"name: Sudoku{player}", "game: Archipeladoku", "Archipeladoku:"]
+        lines.extend(f"  {key}: {value}" for key, value in player_options.items())
+        (directory / f"Sudoku{player}.yaml").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def parse_options(values: list[str]) -> dict[str, str]:
+    """Parse key=value pairs."""
+
+    options = {}
+
+    for value in values:
+        for pair in value.split(","):
+            key, _, option_value = pair.partition("=")
+            options[key.strip()] = option_value.strip()
+
+    return options
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark generation of multiworlds with Archipeladoku slots.")
+    parser.add_argument("--archipelago", default="../Archipelago", help="Archipelago checkout.")
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--seeds", nargs="*", default=["1"], help="Generation seeds to run every variant with.")
+    parser.add_argument("--option", action="append", default=[], help="Option for every slot, as key=value.")
+    parser.add_argument("--variant", action="append", default=[], help="Variant as name:key=value,key=value.")
+    args = parser.parse_args()
+
+    base_options = parse_options(args.option)
+    variants = [variant.partition(":") for variant in args.variant] or [("default", "", "")]
+    archipelago = pathlib.Path(args.archipelago).resolve()
+
+    for (name, _, overrides) in variants:
+        player_options = {**base_options, **parse_options([overrides] if overrides else [])}
+        runs = []
+
+        for seed in args.seeds:
+            with tempfile.TemporaryDirectory() as directory:
+                write_player_files(pathlib.Path(directory), args.players, player_options)
+                output = subprocess.run(
+                    [sys.executable, "-c", driver_source, directory, seed],
+                    cwd=archipelago,
+                    capture_output=True,
+                    text=True,
+                )
+
+            if output.returncode != 0:
+                raise RuntimeError(f"Generation failed for {name} with seed {seed}:\n{output.stderr}")
+
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        def median(key: str) -> float:
+            return statistics.median(timings.get(key, 0.0) for timings in runs)
+
+        sweeps_per_seed = ", ".join(f"{timings.get('sweeps', 0):.0f}" for timings in runs)
+        print(
+            f"{name}: total {median('total'):.2f}s,"
+            f" fill {median('distribute_items_restrictive'):.2f}s,"
+            f" balancing {median('balance_multiworld_progression'):.2f}s,"
+            f" sweeps {median('sweeps'):.0f} (per seed {sweeps_per_seed})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark removing givens incrementally against solving from scratch.
+
+Lays out boards with utils.position_boards through the generation data, places numbers once with
+apworld/generation.py, then removes givens from the same solution twice: solving every cluster from
+scratch after each removal, and with the incremental remover keeping solver state between removals.
+Both use the same random streams, so they have to end up with the same givens, which is checked.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/benchmark_given_removal.py --block-sizes 9 16 --boards 10 --difficulties 1 5
+"""
+
+import argparse
+import importlib
+import time
+
+import benchmark_large_grids
+import build_locations
+
+
+def remove_givens(generation, block_size, clusters, difficulty, seed, solution, incremental) -> tuple[float, list[int]]:
+    """Remove givens from the solution, returns the time taken and the givens."""
+
+    generator = generation.PuzzleGenerator(block_size, clusters, difficulty, seed, incremental_removal=incremental)
+    generator.solution = list(solution)
+
+    started = time.perf_counter()
+    generator.remove_givens()
+
+    return (time.perf_counter() - started, generator.givens)
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark removing givens incrementally.")
+    parser.add_argument("--block-sizes", type=int, nargs="*", default=[9, 16])
+    parser.add_argument("--boards-per-cluster", type=int, default=1)
+    parser.add_argument("--boards", type=int, default=10)
+    parser.add_argument("--difficulties", type=int, nargs="*", default=[1, 3, 5])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    utils = build_locations.load_utils()
+    generation = importlib.import_module("archipeladoku.generation")
+
+    for block_size in args.block_sizes:
+        options = benchmark_large_grids.build_options(block_size, args.boards_per_cluster, args.boards)
+        generation_data = utils.build_generation_data(options, args.seed)
+        clusters = [sorted(cluster.positions) for cluster in generation_data.clusters.values()]
+
+        generator = generation.PuzzleGenerator(block_size, clusters, 1, args.seed)
+        generator.place_numbers()
+
+        for difficulty in args.difficulties:
+            (scratch_seconds, scratch_givens) = remove_givens(
+                generation, block_size, clusters, difficulty, args.seed, generator.solution, False,
+            )
+            (incremental_seconds, incremental_givens) = remove_givens(
+                generation, block_size, clusters, difficulty, args.seed, generator.solution, True,
+            )
+
+            if incremental_givens != scratch_givens:
+                raise ValueError(f"Incremental removal differs for block size {block_size}, difficulty {difficulty}")
+
+            print(
+                f"block_size={block_size} boards={len(clusters)} difficulty={difficulty}:"
+                f" from scratch {scratch_seconds:.2f}s, incremental {incremental_seconds:.2f}s"
+                f" ({scratch_seconds / incremental_seconds:.1f}x),"
+                f" {sum(1 for number in incremental_givens if number)} givens"
+            )
+
+
+if __name__ == "__main__":
+    main()
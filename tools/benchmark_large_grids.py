@@ -0,0 +1,203 @@
+"""Benchmark Archipeladoku with large grids.
+
+Builds locations.txt for each maximum number of boards in a copy of the apworld and measures import
+time, memory and datapackage size of utils in a fresh process. Then measures the per-player generation
+data at the given board counts, and optionally the client puzzle generator with the same layout, the
+way a room would send it in slot data.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago. The client
+generator needs Node 23.6 or later, which can run TypeScript files directly.
+
+Example:
+    python tools/benchmark_large_grids.py --max-boards 100 500 --boards 100 500 --node node
+"""
+
+import argparse
+import json
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import build_locations
+
+
+generator_path = build_locations.apworld_path.parent / "client" / "src" / "js" / "generator.ts"
+
+import_source = """
+import json
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, sys.argv[1])
+import build_locations
+
+build_locations.apworld_path = build_locations.pathlib.Path(sys.argv[2])
+
+# Memory is traced in a second import, tracing slows down the first one.
+started = time.perf_counter()
+utils = build_locations.load_utils()
+elapsed = time.perf_counter() - started
+
+del sys.modules["archipeladoku.utils"]
+tracemalloc.start()
+utils = build_locations.load_utils()
+peak_bytes = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+
+print(json.dumps({
+    "seconds": elapsed,
+    "peak_bytes": peak_bytes,
+    "locations": len(utils.valid_locations),
+    "datapackage_bytes": build_locations.datapackage_size(utils),
+}))
+"""
+
+runner_source = """
+import * as generator from %s
+
+import { readFileSync } from 'node:fs'
+
+const args = JSON.parse(readFileSync(0, 'utf-8'))
+let started = performance.now()
+let state = generator.initGeneration(args)
+const initMs = performance.now() - started
+while (state.type !== 'Completed' && state.type !== 'Failed') {
+    state = generator.generate(state)
+}
+console.log(JSON.stringify({
+    type: state.type,
+    initMs: initMs,
+    ms: performance.now() - started,
+    heapBytes: process.memoryUsage().heapUsed,
+}))
+"""
+
+
+def build_options(block_size: int, boards_per_cluster: int, number_of_boards: int) -> types.SimpleNamespace:
+    """Options with the values build_generation_data reads, fillers all set to Nothing."""
+
+    def value(value: int) -> types.SimpleNamespace:
+        return types.SimpleNamespace(value=value)
+
+    return types.SimpleNamespace(
+        block_size=value(block_size),
+        boards_per_cluster=value(boards_per_cluster),
+        number_of_boards=value(number_of_boards),
+        duplicate_progression=value(0),
+        solve_random_cell_ratio=value(0),
+        remove_random_candidate_ratio=value(0),
+        solve_selected_cell_ratio=value(0),
+        emoji_trap_ratio=value(0),
+        disco_trap_ratio=value(0),
+        tunnel_vision_trap_ratio=value(0),
+    )
+
+
+def benchmark_registration(max_boards: int) -> dict:
+    """Import utils with locations.txt built for max_boards, in a fresh process."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        apworld_copy = pathlib.Path(directory) / "apworld"
+        shutil.copytree(build_locations.apworld_path, apworld_copy)
+
+        utils = build_locations.load_utils()
+        utils.max_number_of_boards = max_boards
+        location_ids = build_locations.reachable_location_ids(utils)
+        (apworld_copy / "locations.txt").write_text(
+            build_locations.format_locations(location_ids, max_boards),
+            encoding="utf-8",
+            newline="\n",
+        )
+
+        output = subprocess.run(
+            [sys.executable, "-c", import_source, str(pathlib.Path(__file__).parent), str(apworld_copy)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def run_client_generator(node: str, runner: pathlib.Path, args: dict) -> dict:
+    """Generate puzzles for the layout with the client generator."""
+
+    output = subprocess.run(
+        [node, runner],
+        input=json.dumps(args),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark Archipeladoku with large grids.")
+    parser.add_argument("--max-boards", type=int, nargs="*", default=[100, 500], help="locations.txt builds.")
+    parser.add_argument("--boards", type=int, nargs="*", default=[100, 500], help="Boards per player.")
+    parser.add_argument("--block-sizes", type=int, nargs="*", default=[4, 9])
+    parser.add_argument("--boards-per-cluster", type=int, default=1)
+    parser.add_argument("--difficulty", type=int, default=1)
+    parser.add_argument("--node", help="Node executable to also run the client generator with.")
+    args = parser.parse_args()
+
+    for max_boards in args.max_boards:
+        result = benchmark_registration(max_boards)
+        print(
+            f"locations.txt for {max_boards} boards: {result['locations']} locations,"
+            f" import {result['seconds'] * 1000:.0f}ms, peak {result['peak_bytes'] / 2**20:.1f}MiB,"
+            f" datapackage {result['datapackage_bytes'] / 2**20:.2f}MiB"
+        )
+
+    utils = build_locations.load_utils()
+    utils.max_number_of_boards = max(args.max_boards)
+
+    with tempfile.TemporaryDirectory() as directory:
+        runner = pathlib.Path(directory) / "runner.mjs"
+        runner.write_text(runner_source % json.dumps(generator_path.as_uri()), encoding="utf-8")
+
+        for block_size in args.block_sizes:
+            for boards in args.boards:
+                options = build_options(block_size, args.boards_per_cluster, boards)
+                started = time.perf_counter()
+                generation_data = utils.build_generation_data(options, 1)
+                elapsed = time.perf_counter() - started
+
+                tracemalloc.start()
+                utils.build_generation_data(options, 1)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                boards_generated = sum(len(cluster.positions) for cluster in generation_data.clusters.values())
+                line = (
+                    f"block_size={block_size} boards={boards_generated}:"
+                    f" generation data {elapsed * 1000:.0f}ms, peak {peak / 2**20:.1f}MiB"
+                )
+
+                if args.node:
+                    result = run_client_generator(args.node, runner, {
+                        "blockSize": block_size,
+                        "blockUnlockOrder": generation_data.block_unlock_order,
+                        "clusters": [sorted(cluster.positions) for cluster in generation_data.clusters.values()],
+                        "difficulty": args.difficulty,
+                        "seed": 1,
+                    })
+                    line += (
+                        f", client {result['type']} in {result['ms'] / 1000:.1f}s"
+                        f" (init {result['initMs']:.0f}ms, heap {result['heapBytes'] / 2**20:.0f}MiB)"
+                    )
+
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark location lookups across worker processes.
+
+Starts worker processes side by side, the way a WebHost runs generators, and compares two ways of
+getting at the location and item names in each of them:
+
+- registration: importing utils, which registers every name in dicts and group sets, as a World needs
+- table: mapping tools/locations.bin and looking names up in place
+
+Each worker reports the CPU time of its warm-up and of random lookups, which isn't skewed by workers
+sharing a CPU, and its RSS and PSS growth. PSS splits shared pages between the processes mapping them,
+so the mapped table only counts once in the total. Memory is read from /proc, so this needs Linux.
+
+Needs tools/locations.bin, built with tools/build_locations.py --table. Only needs the Python standard
+library, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/benchmark_location_table.py --workers 8
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+
+import build_locations
+
+
+lookup_count = 10000
+
+
+def read_memory() -> tuple[int, int]:
+    """RSS and PSS of the current process, in bytes."""
+
+    def read_kilobytes(path: str, key: str) -> int:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.startswith(key):
+                    return int(line.split()[1]) * 1024
+
+        raise ValueError(f"No {key} in {path}")
+
+    return (read_kilobytes("/proc/self/status", "VmRSS:"), read_kilobytes("/proc/self/smaps_rollup", "Pss:"))
+
+
+def run_worker(mode: str, barrier, results) -> None:
+
+    (rss_before, pss_before) = read_memory()
+    started = time.process_time()
+
+    if mode == "registration":
+        utils = build_locations.load_utils()
+        location_ids = list(utils.location_name_to_id.values())
+        location_id_to_name = {location_id: name for (name, location_id) in utils.location_name_to_id.items()}
+
+        def lookup(location_id: int) -> int:
+            return utils.location_name_to_id[location_id_to_name[location_id]]
+
+    else:
+        location_table = build_locations.load_location_table()
+        location_ids = location_table.locations.ids
+
+        def lookup(location_id: int) -> int:
+            return location_table.locations.get_id(location_table.locations.get_name(location_id))
+
+    warm_up = time.process_time() - started
+    queries = random.Random(1).choices(location_ids, k=lookup_count)
+
+    started = time.process_time()
+    for location_id in queries:
+        if lookup(location_id) != location_id:
+            raise ValueError(f"Lookup of {location_id} failed")
+    lookups = time.process_time() - started
+
+    # Measure while every worker is set up, so shared pages are split between all of them.
+    barrier.wait()
+    (rss_after, pss_after) = read_memory()
+    barrier.wait()
+
+    results.put({
+        "warm_up": warm_up,
+        "lookups": lookups,
+        "rss": rss_after - rss_before,
+        "pss": pss_after - pss_before,
+    })
+
+
+def run_workers(mode: str, workers: int) -> list[dict]:
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(mode, barrier, results)) for _ in range(workers)]
+
+    for process in processes:
+        process.start()
+
+    worker_results = [results.get() for _ in processes]
+
+    for process in processes:
+        process.join()
+
+    return worker_results
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark location lookups across worker processes.")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    for mode in ["registration", "table"]:
+        worker_results = run_workers(mode, args.workers)
+        count = len(worker_results)
+        print(
+            f"{mode}, {count} workers:"
+            f" warm-up {sum(result['warm_up'] for result in worker_results) / count * 1000:.1f}ms,"
+            f" {lookup_count} lookups {sum(result['lookups'] for result in worker_results) / count * 1000:.1f}ms,"
+            f" RSS {sum(result['rss'] for result in worker_results) / count / 2**20:.1f}MiB per worker,"
+            f" PSS {sum(result['pss'] for result in worker_results) / 2**20:.1f}MiB in total"
+        )
+
+
+if __name__ == "__main__":
+    main()
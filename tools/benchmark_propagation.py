@@ -0,0 +1,93 @@
+"""Benchmark vectorized cluster propagation against the per-cell Python loop.
+
+Boards are laid out with `utils.position_boards` and grouped with `utils.group_positions` into clusters
+of boards that share blocks. apworld/generation.py places numbers on every board, which gives one
+solution for overlapping boards. Then a share of the cells is cleared and both engines propagate
+singles back to the solution, one whole cluster at a time. Times are summed over the clusters.
+
+Only needs the Python standard library and NumPy, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/benchmark_propagation.py --block-sizes 9 16 --boards-per-cluster 1 5 100 --boards 10 36
+"""
+
+import argparse
+import importlib
+import random
+import time
+
+import build_locations
+
+
+def build_solution(generation, block_size: int, positions: list[tuple[int, int]]) -> dict[tuple[int, int], int]:
+    """A valid solution for every board, placed board by board like the client does."""
+
+    generator = generation.PuzzleGenerator(block_size, [[position] for position in positions], 1, 1)
+    generator.place_numbers()
+
+    return dict(zip(generator.geometry.cells, generator.solution))
+
+
+def time_call(function, repeat: int) -> float:
+    """Best of several runs, in milliseconds."""
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+
+    return best * 1000.0
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Benchmark Archipeladoku candidate propagation.")
+    parser.add_argument("--block-sizes", type=int, nargs="*", default=[9, 16])
+    parser.add_argument("--boards-per-cluster", type=int, nargs="*", default=[1, 5, 100])
+    parser.add_argument("--boards", type=int, nargs="*", default=[10, 36])
+    parser.add_argument("--removed", type=float, default=0.4, help="Share of cells to clear.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    utils = build_locations.load_utils()
+    generation = importlib.import_module("archipeladoku.generation")
+    propagation = importlib.import_module("archipeladoku.propagation")
+    rng = random.Random(1)
+
+    for block_size in args.block_sizes:
+        for boards_per_cluster in args.boards_per_cluster:
+            for boards in args.boards:
+                number_of_boards = utils.get_number_of_boards(block_size, boards)
+                positions = utils.position_boards(block_size, boards_per_cluster, number_of_boards)
+                clusters = utils.group_positions(block_size, positions)
+                solution = build_solution(generation, block_size, positions)
+                givens = {cell: number for cell, number in solution.items() if rng.random() >= args.removed}
+                (per_cell_ms, vectorized_ms, largest_cluster) = (0.0, 0.0, 0)
+
+                for cluster in clusters.values():
+                    geometry = propagation.build_cluster_geometry(block_size, sorted(cluster))
+                    cluster_givens = {cell: givens[cell] for cell in geometry.cells if cell in givens}
+                    propagator = propagation.VectorizedPropagator(geometry)
+                    largest_cluster = max(largest_cluster, len(geometry.cells))
+
+                    if propagator.propagate(cluster_givens) != propagation.propagate_per_cell(geometry, cluster_givens):
+                        raise RuntimeError("Propagation results differ")
+
+                    per_cell_ms += time_call(
+                        lambda: propagation.propagate_per_cell(geometry, cluster_givens), args.repeat,
+                    )
+                    vectorized_ms += time_call(lambda: propagator.propagate(cluster_givens), args.repeat)
+
+                print(
+                    f"block_size={block_size} boards_per_cluster={boards_per_cluster} boards={number_of_boards}"
+                    f" clusters={len(clusters)} cells={len(solution)} largest cluster={largest_cluster} cells:"
+                    f" per-cell {per_cell_ms:.1f}ms, vectorized {vectorized_ms:.1f}ms"
+                    f" ({per_cell_ms / vectorized_ms:.1f}x)",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
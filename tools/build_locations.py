@@ -0,0 +1,306 @@
+"""Regenerate apworld/locations.txt from the board geometry.
+
+locations.txt lists every location id reachable by the supported option space, one per line, after a
+sha256 checksum line that utils verifies on load. Block items are registered for the block
+locations, so this also determines the item ids.
+
+--check also compares utils.get_generation_counts, which counts locations and items from the options
+alone, with the layout and items build_generation_data makes over the option grid.
+
+With --table, also writes tools/locations.bin: the same ids with their names prebuilt, as a location
+table for processes that only look names up (see tools/location_table.py). It isn't part of the apworld
+and isn't committed, locations.txt stays the only source of the ids.
+
+The default build covers up to 100 boards (64 at block size 12, 36 at block size 16). Events that want
+larger grids can build with more, up to 500 (320 and 180), at the cost of a larger datapackage for every
+room using that build. The range of the Number of Boards option follows the build.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/build_locations.py          # Rewrite locations.txt
+    python tools/build_locations.py --check  # Fail if the files are out of date
+    python tools/build_locations.py --table  # Also write locations.bin
+    python tools/build_locations.py --max-boards 500
+"""
+
+import argparse
+import hashlib
+import importlib
+import importlib.util
+import itertools
+import json
+import pathlib
+import sys
+import types
+
+import location_table
+
+
+apworld_path = pathlib.Path(__file__).resolve().parent.parent / "apworld"
+locations_path = apworld_path / "locations.txt"
+table_path = pathlib.Path(__file__).resolve().parent / "locations.bin"
+
+# Keep in sync with BlockSize, BoardsPerCluster and NumberOfBoards in options.py.
+block_sizes = [4, 6, 8, 9, 12, 16]
+boards_per_cluster_values = [1, 5, 8, 13, 100]
+min_number_of_boards = 3
+default_max_number_of_boards = 100
+
+# Option values to cross-check the generation counts with, on top of the block sizes and boards per cluster.
+checked_numbers_of_boards = [min_number_of_boards, 7, 13, 50, 500]
+checked_duplicate_progressions = [0, 35, 100]
+checked_filler_ratios = [
+    {},
+    {"solve_random_cell_ratio": 150, "remove_random_candidate_ratio": 300, "solve_selected_cell_ratio": 100},
+    {"emoji_trap_ratio": 400, "disco_trap_ratio": 400, "tunnel_vision_trap_ratio": 400},
+]
+
+
+def load_package() -> None:
+    """Create the apworld package module without running its __init__, which needs Archipelago."""
+
+    spec = importlib.util.spec_from_file_location(
+        "archipeladoku", apworld_path / "__init__.py", submodule_search_locations=[str(apworld_path)],
+    )
+    # The package module is created but never executed.
+    sys.modules["archipeladoku"] = importlib.util.module_from_spec(spec)
+
+
+def load_utils() -> types.ModuleType:
+    """Import apworld/utils.py without running the package __init__."""
+
+    load_package()
+
+    return importlib.import_module("archipeladoku.utils")
+
+
+def load_location_table() -> location_table.LocationTable:
+    """Map tools/locations.bin without importing utils, which would register every name."""
+
+    if not table_path.exists():
+        raise FileNotFoundError("locations.bin has not been built, run tools/build_locations.py --table")
+
+    table = location_table.LocationTable.open(str(table_path))
+    contents = locations_path.read_text(encoding="utf-8").partition("\n")[2]
+
+    if table.checksum != hashlib.sha256(contents.encode("utf-8")).digest():
+        table.close()
+        raise ValueError("locations.bin does not match locations.txt, run tools/build_locations.py --table")
+
+    return table
+
+
+def reachable_location_ids(utils) -> set[int]:
+    """Every location id any supported option combination can produce."""
+
+    location_ids = set()
+
+    for block_size in block_sizes:
+        for boards_per_cluster in boards_per_cluster_values:
+            for (row, col) in reachable_board_positions(utils, block_size, boards_per_cluster):
+                if max(row, col) + block_size - 1 > utils.max_coordinate:
+                    raise ValueError(f"Board at {row}, {col} does not fit the id scheme")
+
+                location_ids.add(utils.board_id(row, col))
+
+                for block in utils.build_blocks(block_size, (row, col)):
+                    location_ids.add(utils.block_id(*block))
+
+                for offset in range(block_size):
+                    location_ids.add(utils.row_id(row + offset, col))
+                    location_ids.add(utils.col_id(row, col + offset))
+
+    return location_ids
+
+
+def reachable_board_positions(utils, block_size: int, boards_per_cluster: int) -> set[tuple[int, int]]:
+    """Board positions of every number of boards, as laid out by utils.position_boards.
+
+    Cluster positions only depend on the cluster index, so instead of laying out every number of boards,
+    each cluster position gets the full cluster plus every partial cluster that can end up there.
+    """
+
+    max_boards = utils.get_max_number_of_boards(block_size)
+    cluster_count = -(-max_boards // boards_per_cluster)
+    [ cluster_rows, cluster_cols ] = utils.get_cluster_dimensions(block_size, boards_per_cluster)
+    cluster_positions = utils.position_clusters(cluster_count, 0, cluster_rows, cluster_cols)
+    positions = set()
+
+    for (idx, (cluster_row, cluster_col)) in enumerate(cluster_positions):
+        sizes = [
+            size for size in range(1, boards_per_cluster + 1)
+            if min_number_of_boards <= idx * boards_per_cluster + size <= max_boards
+            or (size == boards_per_cluster and (idx + 1) * boards_per_cluster <= max_boards)
+        ]
+
+        for size in sizes:
+            for (row_offset, col_offset) in utils.position_boards_in_cluster(block_size, size):
+                positions.add((cluster_row + row_offset - 1, cluster_col + col_offset - 1))
+
+    return positions
+
+
+def format_locations(location_ids: set[int], max_number_of_boards: int) -> str:
+    """Format the file contents, checksum line first."""
+
+    body = f"# max_number_of_boards {max_number_of_boards}\n"
+    body += "".join(f"{location_id}\n" for location_id in sorted(location_ids))
+    checksum = hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    return f"# sha256 {checksum}\n{body}"
+
+
+def format_table(utils, location_ids: set[int], max_number_of_boards: int, contents: str) -> bytes:
+    """Location table with the names of the ids, matching locations.txt with the given contents."""
+
+    checksum = hashlib.sha256(contents.partition("\n")[2].encode("utf-8")).digest()
+
+    return location_table.format_location_table(
+        max_number_of_boards,
+        checksum,
+        [
+            (location_id, utils.block_item_name(location_id // 1000 % 1000, location_id % 1000))
+            for location_id in location_ids
+            if location_id // 1000000 == 1
+        ],
+        [(location_id, utils.location_name(location_id)) for location_id in location_ids],
+    )
+
+
+def check_generation_counts(utils) -> tuple[int, list[str]]:
+    """Compare utils.get_generation_counts with build_generation_data over the option grid.
+    Returns the number of option sets checked and a description of each mismatch.
+    """
+
+    def value(value: int) -> types.SimpleNamespace:
+        return types.SimpleNamespace(value=value)
+
+    option_sets = itertools.product(
+        block_sizes,
+        boards_per_cluster_values,
+        checked_numbers_of_boards,
+        checked_duplicate_progressions,
+        checked_filler_ratios,
+    )
+    checked = 0
+    mismatches = []
+
+    for (block_size, boards_per_cluster, number_of_boards, duplicate_progression, ratios) in option_sets:
+        options = types.SimpleNamespace(
+            block_size=value(block_size),
+            boards_per_cluster=value(boards_per_cluster),
+            number_of_boards=value(number_of_boards),
+            duplicate_progression=value(duplicate_progression),
+            **{
+                name: value(ratios.get(name, 0))
+                for name in [
+                    "solve_random_cell_ratio",
+                    "remove_random_candidate_ratio",
+                    "solve_selected_cell_ratio",
+                    "emoji_trap_ratio",
+                    "disco_trap_ratio",
+                    "tunnel_vision_trap_ratio",
+                ]
+            },
+        )
+        counts = utils.get_generation_counts(options)
+        generation_data = utils.build_generation_data(options, checked)
+        checked += 1
+
+        # Count the locations create_regions makes from the layout, by their distinct ids.
+        location_ids = {kind: set() for kind in ["boards", "blocks", "rows", "columns"]}
+
+        for cluster in generation_data.clusters.values():
+            for (row, col) in cluster.positions:
+                location_ids["boards"].add(utils.board_id(row, col))
+
+                for offset in range(block_size):
+                    location_ids["rows"].add(utils.row_id(row + offset, col))
+                    location_ids["columns"].add(utils.col_id(row, col + offset))
+
+            location_ids["blocks"].update(utils.block_id(*block) for block in cluster.blocks)
+
+        progression_items = len(generation_data.block_unlock_order) - block_size
+        duplicate_progression_count = generation_data.duplicate_progression_count
+        filler_count = sum(generation_data.filler_counts.values())
+        actual = {kind: len(ids) for (kind, ids) in location_ids.items()}
+        actual.update({
+            "progression_items": progression_items,
+            "duplicate_progression_count": duplicate_progression_count,
+            "filler_counts": generation_data.filler_counts,
+            "items": progression_items + duplicate_progression_count + filler_count,
+        })
+        expected = {kind: getattr(counts, kind) for kind in actual}
+
+        # Every location gets an item, besides the locked victory.
+        expected["items"] = counts.locations
+
+        for (kind, actual_value) in actual.items():
+            if actual_value != expected[kind]:
+                mismatches.append(
+                    f"{block_size=} {boards_per_cluster=} {number_of_boards=} {duplicate_progression=}"
+                    f" {ratios}: {kind} is {expected[kind]}, generation has {actual_value}"
+                )
+
+    return (checked, mismatches)
+
+
+def datapackage_size(utils) -> int:
+    """Size of the game's datapackage as sent to clients, in bytes of JSON."""
+
+    return len(json.dumps({
+        "item_name_to_id": utils.item_name_to_id,
+        "location_name_to_id": utils.location_name_to_id,
+    }))
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Regenerate apworld/locations.txt.")
+    parser.add_argument("--check", action="store_true", help="Only check that the files are up to date.")
+    parser.add_argument("--table", action="store_true", help="Also write tools/locations.bin.")
+    parser.add_argument("--max-boards", type=int, help="Largest number of boards to register locations for.")
+    args = parser.parse_args()
+
+    utils = load_utils()
+    before_locations = len(utils.valid_locations)
+    before_size = datapackage_size(utils)
+
+    if args.max_boards is not None:
+        utils.max_number_of_boards = args.max_boards
+    elif not args.check:
+        utils.max_number_of_boards = default_max_number_of_boards
+
+    location_ids = reachable_location_ids(utils)
+    contents = format_locations(location_ids, utils.max_number_of_boards)
+    table = format_table(utils, location_ids, utils.max_number_of_boards, contents)
+
+    if args.check:
+        if locations_path.read_text(encoding="utf-8") != contents:
+            sys.exit("locations.txt is out of date, run tools/build_locations.py")
+        if table_path.exists() and table_path.read_bytes() != table:
+            sys.exit("locations.bin is out of date, run tools/build_locations.py --table")
+        print("locations.txt is up to date")
+
+        (checked, mismatches) = check_generation_counts(utils)
+        if mismatches:
+            sys.exit("Generation counts don't match generation:\n" + "\n".join(mismatches))
+        print(f"Generation counts match generation for {checked} option sets")
+        return
+
+    print(f"Before: {before_locations} locations, datapackage {before_size} bytes")
+    locations_path.write_text(contents, encoding="utf-8", newline="\n")
+
+    # Replace the table instead of writing into it, processes that have it mapped keep the old one.
+    if args.table or table_path.exists():
+        temporary_path = table_path.with_name("locations.bin.tmp")
+        temporary_path.write_bytes(table)
+        temporary_path.replace(table_path)
+
+    utils = importlib.reload(utils)
+    print(f"After: {len(utils.valid_locations)} locations, datapackage {datapackage_size(utils)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark the client puzzle generator over the option grid and print cost model coefficients.
+
+Runs client/src/js/generator.ts with Node for every block size, boards per cluster and difficulty, for
+a few board counts and seeds, and fits the milliseconds per board used by
+`utils.estimate_generation_cost`. The generator gets the clusters and block unlock order from
+utils.build_generation_data, the way a room sends them in slot data. Boards per cluster changes which
+cells boards share, so it is measured too and printed per value, but the client generates one board at
+a time and the spread between values is within seed noise. The table takes the median over boards per
+cluster and can be pasted over `generation_ms_per_board` in apworld/utils.py.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago. Requires
+Node 23.6 or later, which can run TypeScript files directly.
+
+Example:
+    python tools/calibrate_cost_model.py --node node --seeds 3
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import tempfile
+
+import benchmark_large_grids
+import build_locations
+
+
+difficulties = [1, 2, 3, 4, 5]
+
+
+def run_generator(node: str, runner: pathlib.Path, utils, options, difficulty: int, seed: int) -> float:
+    """Run the generator once on the layout of the options and return the elapsed milliseconds."""
+
+    block_size = options.block_size.value
+    generation_data = utils.build_generation_data(options, seed)
+    result = benchmark_large_grids.run_client_generator(node, runner, {
+        "blockSize": block_size,
+        "blockUnlockOrder": generation_data.block_unlock_order,
+        "clusters": [sorted(cluster.positions) for cluster in generation_data.clusters.values()],
+        "difficulty": difficulty,
+        "seed": seed,
+    })
+
+    if result["type"] != "Completed":
+        raise RuntimeError(f"Generation failed for {block_size=} {difficulty=} {seed=}")
+
+    return result["ms"]
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Calibrate the Archipeladoku generation cost model.")
+    parser.add_argument("--node", default="node", help="Node executable, 23.6 or later.")
+    parser.add_argument("--boards", type=int, nargs="*", default=[5, 13], help="Board counts to measure.")
+    parser.add_argument("--block-sizes", type=int, nargs="*", default=build_locations.block_sizes)
+    parser.add_argument(
+        "--boards-per-cluster", type=int, nargs="*", default=build_locations.boards_per_cluster_values,
+    )
+    parser.add_argument("--seeds", type=int, default=3, help="Seeds per configuration.")
+    args = parser.parse_args()
+
+    utils = build_locations.load_utils()
+    coefficients = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        runner = pathlib.Path(directory) / "runner.mjs"
+        runner.write_text(
+            benchmark_large_grids.runner_source % json.dumps(benchmark_large_grids.generator_path.as_uri()),
+            encoding="utf-8",
+        )
+
+        for block_size in args.block_sizes:
+            coefficients[block_size] = {difficulty: [] for difficulty in difficulties}
+
+            for boards_per_cluster in args.boards_per_cluster:
+                for difficulty in difficulties:
+                    samples = []
+
+                    for boards in args.boards:
+                        options = benchmark_large_grids.build_options(block_size, boards_per_cluster, boards)
+                        number_of_boards = utils.get_number_of_boards(block_size, boards)
+
+                        for seed in range(1, args.seeds + 1):
+                            ms = run_generator(args.node, runner, utils, options, difficulty, seed)
+                            samples.append(ms / number_of_boards)
+
+                    ms_per_board = round(statistics.median(samples))
+                    coefficients[block_size][difficulty].append(ms_per_board)
+                    print(
+                        f"# {block_size=} {boards_per_cluster=} {difficulty=}: {ms_per_board}ms per board",
+                        flush=True,
+                    )
+
+    print("generation_ms_per_board = {")
+    for block_size, per_difficulty in coefficients.items():
+        values = ", ".join(f"{difficulty}: {round(statistics.median(ms))}" for difficulty, ms in per_difficulty.items())
+        print(f"    {block_size}: {{{values}}},")
+    print("}")
+
+
+if __name__ == "__main__":
+    main()
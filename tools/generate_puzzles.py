@@ -0,0 +1,122 @@
+"""Generate puzzles for a player in Python.
+
+Builds the generation data for the options and seed, splits it into single-board clusters the way the
+client does, and generates givens and solution with apworld/generation.py. Progress is printed while
+generating, followed by the time spent on each cluster and the clusters that fell back to the cheaper
+given removal. Running again with --fallback-clusters set to those clusters reproduces the result
+without a time budget. The boards can be written as a board file, or as a cluster stream with the
+clusters in unlock order.
+
+Only needs the Python standard library, the apworld package is loaded without Archipelago.
+
+Example:
+    python tools/generate_puzzles.py --block-size 9 --boards 20 --difficulty 4 --time-budget 0.5
+    python tools/generate_puzzles.py --block-size 9 --boards 20 --difficulty 4 --fallback-clusters 3 7
+    python tools/generate_puzzles.py --block-size 9 --boards 100 --stream-output boards.apds
+"""
+
+import argparse
+import importlib
+import sys
+import time
+
+import benchmark_large_grids
+import build_locations
+
+
+def check_solution(generation, block_size: int, clusters: list[list[tuple[int, int]]], result) -> None:
+    """Fail if a board of the solution breaks a rule or a given differs from the solution."""
+
+    for positions in clusters:
+        geometry = generation.build_cluster_geometry(block_size, positions)
+
+        for area in geometry.areas:
+            numbers = sorted(result.solution[geometry.cells[cell_index]] for cell_index in area)
+            if numbers != list(range(1, block_size + 1)):
+                raise ValueError(f"Invalid area in cluster at {positions}")
+
+    for (cell, number) in result.givens.items():
+        if result.solution[cell] != number:
+            raise ValueError(f"Given at {cell} differs from the solution")
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Generate puzzles for a player in Python.")
+    parser.add_argument("--block-size", type=int, default=9)
+    parser.add_argument("--boards-per-cluster", type=int, default=1)
+    parser.add_argument("--boards", type=int, default=20)
+    parser.add_argument("--difficulty", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--time-budget", type=float, help="Seconds per cluster for removing givens.")
+    parser.add_argument("--fallback-clusters", type=int, nargs="*", default=[])
+    parser.add_argument("--output", help="Write the boards to a board file.")
+    parser.add_argument("--stream-output", help="Write the boards to a cluster stream.")
+    args = parser.parse_args()
+
+    utils = build_locations.load_utils()
+    generation = importlib.import_module("archipeladoku.generation")
+
+    options = benchmark_large_grids.build_options(args.block_size, args.boards_per_cluster, args.boards)
+    generation_data = utils.build_generation_data(options, args.seed)
+    clusters = [sorted(cluster.positions) for cluster in generation_data.clusters.values()]
+
+    cluster_started = {}
+    cluster_seconds = {}
+
+    def on_progress(progress) -> None:
+        key = (progress.stage, progress.cluster_id)
+        cluster_started.setdefault(key, time.perf_counter())
+        cluster_seconds[key] = time.perf_counter() - cluster_started[key]
+
+        if progress.done == progress.total:
+            print(
+                f"\r{progress.stage} {progress.cluster_id}/{progress.cluster_count}",
+                end="",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    started = time.perf_counter()
+    result = generation.generate_puzzles(
+        args.block_size,
+        clusters,
+        args.difficulty,
+        args.seed,
+        time_budget=args.time_budget,
+        fallback_clusters=args.fallback_clusters,
+        on_progress=on_progress,
+    )
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+
+    check_solution(generation, args.block_size, clusters, result)
+
+    removal_seconds = [seconds for ((stage, _), seconds) in cluster_seconds.items() if stage == "removing"]
+    print(
+        f"{len(clusters)} clusters in {elapsed:.2f}s, {len(result.givens)} givens,"
+        f" slowest removal {max(removal_seconds):.2f}s"
+    )
+    print(f"Fallback clusters: {' '.join(map(str, result.fallback_clusters)) or 'none'}")
+
+    board_file = importlib.import_module("archipeladoku.board_file")
+    givens = [(row, col, number) for ((row, col), number) in result.givens.items()]
+    solution = [(row, col, number) for ((row, col), number) in result.solution.items()]
+
+    if args.output:
+        board_file.write_board_file(args.output, args.block_size, clusters, givens, solution)
+
+    if args.stream_output:
+        with open(args.stream_output, "wb") as file:
+            board_file.write_cluster_stream(
+                file,
+                args.block_size,
+                clusters,
+                generation_data.block_unlock_order,
+                givens,
+                solution,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""Headless load-test client for Archipeladoku slots.
+
+Connects any number of simulated players to a running MultiServer, reads the slot data produced by
+the apworld and "solves" blocks, rows, columns and boards by sending location checks at a fixed
+rate, unlocking more boards as block items are received. Reports server round-trip latency and
+throughput when done.
+
+Requires the `websockets` package, which is part of Archipelago's requirements. The apworld package is
+loaded without Archipelago, so ids follow utils.
+
+Example:
+    python tools/load_test.py --url ws://localhost:38281 --name-template "Player{}" --count 200
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import websockets
+
+import build_locations
+
+
+game = "Archipeladoku"
+archipelago_version = {"major": 0, "minor": 6, "build": 5, "class": "Version"}
+
+
+@dataclass
+class Stats:
+    connect_latencies: list[float] = field(default_factory=list)
+    check_latencies: list[float] = field(default_factory=list)
+    scout_latencies: list[float] = field(default_factory=list)
+    checks_sent: int = 0
+    items_received: int = 0
+    death_links_received: int = 0
+    finished_players: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+@dataclass
+class SimulatedCluster:
+    blocks: set[tuple[int, int]]
+    locations: list[int]
+
+
+def build_simulated_clusters(utils, slot_data: dict) -> list[SimulatedCluster]:
+    """Build the locations that become solvable per cluster, in the order a player would solve them."""
+
+    block_size = slot_data["blockSize"]
+    clusters = []
+
+    for positions in slot_data["clusters"]:
+        blocks = set()
+        block_locations = []
+        line_locations = []
+        board_locations = []
+
+        for (board_row, board_col) in positions:
+            for block in sorted(utils.build_blocks(block_size, (board_row, board_col))):
+                if block not in blocks:
+                    blocks.add(block)
+                    block_locations.append(utils.block_id(*block))
+
+            for offset in range(block_size):
+                line_locations.append(utils.row_id(board_row + offset, board_col))
+                line_locations.append(utils.col_id(board_row, board_col + offset))
+
+            board_locations.append(utils.board_id(board_row, board_col))
+
+        clusters.append(SimulatedCluster(
+            blocks=blocks,
+            locations=block_locations + line_locations + board_locations,
+        ))
+
+    return clusters
+
+
+class SimulatedPlayer:
+
+    def __init__(self, args: argparse.Namespace, utils, name: str, stats: Stats):
+        self.args = args
+        self.utils = utils
+        self.name = name
+        self.stats = stats
+        self.rng = random.Random(f"{args.seed}-{name}")
+        self.slot_data = {}
+        self.missing_locations = set()
+        self.pending_checks = {}
+        self.pending_scouts = {}
+        self.unlocked_blocks = set()
+        self.block_items = {}
+        self.progressive_blocks = 0
+        self.solvable_clusters = []
+        self.locked_clusters = []
+        self.connected = asyncio.Event()
+        self.connect_started = 0.0
+
+
+    async def run(self, connect_semaphore: asyncio.Semaphore) -> None:
+
+        try:
+            async with websockets.connect(self.args.url, max_size=None, ping_interval=None) as socket:
+                receiver = asyncio.create_task(self.receive(socket))
+                await connect_semaphore.acquire()
+                self.connect_started = time.perf_counter()
+                await self.send(socket, {
+                    "cmd": "Connect",
+                    "game": game,
+                    "name": self.name,
+                    "password": self.args.password,
+                    "uuid": uuid.uuid4().hex,
+                    "version": archipelago_version,
+                    "items_handling": 0b111,
+                    "tags": [],
+                    "slot_data": True,
+                })
+
+                try:
+                    await asyncio.wait_for(self.connected.wait(), self.args.timeout)
+                finally:
+                    connect_semaphore.release()
+
+                if not self.slot_data:
+                    return
+
+                if self.slot_data.get("deathLink"):
+                    await self.send(socket, {"cmd": "ConnectUpdate", "tags": ["DeathLink"]})
+
+                await self.solve(socket)
+                receiver.cancel()
+
+        except Exception as e:
+            self.stats.errors.append(f"{self.name}: {type(e).__name__}: {e}")
+
+
+    async def send(self, socket, *commands: dict) -> None:
+
+        await socket.send(json.dumps(list(commands)))
+
+
+    async def receive(self, socket) -> None:
+
+        async for message in socket:
+            now = time.perf_counter()
+
+            for command in json.loads(message):
+                match command["cmd"]:
+                    case "Connected":
+                        self.stats.connect_latencies.append(now - self.connect_started)
+                        self.slot_data = command["slot_data"]
+                        self.missing_locations = set(command["missing_locations"])
+                        self.setup_clusters()
+                        self.connected.set()
+
+                    case "ConnectionRefused":
+                        self.stats.errors.append(f"{self.name}: Connection refused: {command.get('errors')}")
+                        self.connected.set()
+                        return
+
+                    case "ReceivedItems":
+                        for item in command["items"]:
+                            self.receive_item(item["item"])
+
+                    case "RoomUpdate":
+                        for location in command.get("checked_locations", []):
+                            sent = self.pending_checks.pop(location, None)
+                            if sent is not None:
+                                self.stats.check_latencies.append(now - sent)
+
+                    case "LocationInfo":
+                        for location in command["locations"]:
+                            sent = self.pending_scouts.pop(location["location"], None)
+                            if sent is not None:
+                                self.stats.scout_latencies.append(now - sent)
+
+                    case "Bounced":
+                        if "DeathLink" in command.get("tags", []):
+                            self.stats.death_links_received += 1
+
+
+    def setup_clusters(self) -> None:
+
+        block_size = self.slot_data["blockSize"]
+        block_unlock_order = [tuple(block) for block in self.slot_data["blockUnlockOrder"]]
+        self.unlocked_blocks = set(block_unlock_order[:block_size])
+        self.block_items = {self.utils.block_id(*block): block for block in block_unlock_order}
+        self.locked_clusters = build_simulated_clusters(self.utils, self.slot_data)
+        self.update_solvable_clusters()
+
+
+    def receive_item(self, item_id: int) -> None:
+
+        self.stats.items_received += 1
+
+        if item_id == self.utils.item_name_to_id["Progressive Block"]:
+            self.progressive_blocks += 1
+            block_size = self.slot_data["blockSize"]
+            block_unlock_order = self.slot_data["blockUnlockOrder"]
+            self.unlocked_blocks.update(
+                tuple(block) for block in block_unlock_order[:block_size + self.progressive_blocks]
+            )
+
+        elif item_id in self.block_items:
+            self.unlocked_blocks.add(self.block_items[item_id])
+
+        else:
+            return
+
+        self.update_solvable_clusters()
+
+
+    def update_solvable_clusters(self) -> None:
+
+        still_locked = []
+
+        for cluster in self.locked_clusters:
+            if cluster.blocks <= self.unlocked_blocks:
+                self.solvable_clusters.append(cluster)
+            else:
+                still_locked.append(cluster)
+
+        self.locked_clusters = still_locked
+
+
+    async def solve(self, socket) -> None:
+
+        interval = 1.0 / self.args.checks_per_second
+        await asyncio.sleep(self.rng.uniform(0, interval))
+        idle_since = time.perf_counter()
+
+        while self.locked_clusters or self.solvable_clusters:
+            if not self.solvable_clusters:
+                if time.perf_counter() - idle_since > self.args.timeout:
+                    self.stats.errors.append(f"{self.name}: Stuck with {len(self.locked_clusters)} locked clusters")
+                    return
+
+                await asyncio.sleep(interval)
+                continue
+
+            cluster = self.solvable_clusters.pop(0)
+            locations = [location for location in cluster.locations if location in self.missing_locations]
+
+            if self.slot_data.get("locationScouting") == "auto" and locations:
+                sent = time.perf_counter()
+                for location in locations:
+                    self.pending_scouts[location] = sent
+                await self.send(socket, {"cmd": "LocationScouts", "locations": locations, "create_as_hint": 0})
+
+            for location in locations:
+                self.pending_checks[location] = time.perf_counter()
+                self.missing_locations.discard(location)
+                await self.send(socket, {"cmd": "LocationChecks", "locations": [location]})
+                self.stats.checks_sent += 1
+                await asyncio.sleep(interval)
+
+            idle_since = time.perf_counter()
+
+        deadline = time.perf_counter() + self.args.timeout
+        while self.pending_checks and time.perf_counter() < deadline:
+            await asyncio.sleep(interval)
+
+        await self.send(socket, {"cmd": "StatusUpdate", "status": 30})
+        self.stats.finished_players += 1
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100.0 * len(ordered)) - 1)
+
+    return ordered[index]
+
+
+def format_latencies(label: str, values: list[float]) -> str:
+    """Format a latency summary in milliseconds."""
+
+    if not values:
+        return f"{label}: no samples"
+
+    return (
+        f"{label}: n={len(values)}"
+        f" mean={statistics.fmean(values) * 1000:.1f}ms"
+        f" p50={percentile(values, 50) * 1000:.1f}ms"
+        f" p95={percentile(values, 95) * 1000:.1f}ms"
+        f" p99={percentile(values, 99) * 1000:.1f}ms"
+        f" max={max(values) * 1000:.1f}ms"
+    )
+
+
+async def run_load_test(args: argparse.Namespace) -> Stats:
+
+    stats = Stats()
+    utils = build_locations.load_utils()
+    names = args.names or [args.name_template.format(i) for i in range(1, args.count + 1)]
+    players = [SimulatedPlayer(args, utils, name, stats) for name in names]
+    connect_semaphore = asyncio.Semaphore(args.connect_concurrency)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(player.run(connect_semaphore) for player in players))
+    elapsed = time.perf_counter() - started
+
+    print(f"Players: {len(players)} ({stats.finished_players} finished)")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Checks sent: {stats.checks_sent} ({stats.checks_sent / elapsed:.1f}/s)")
+    print(f"Checks confirmed: {len(stats.check_latencies)} ({len(stats.check_latencies) / elapsed:.1f}/s)")
+    print(f"Items received: {stats.items_received}")
+    print(f"Death links received: {stats.death_links_received}")
+    print(format_latencies("Connect", stats.connect_latencies))
+    print(format_latencies("Location check", stats.check_latencies))
+    print(format_latencies("Location scout", stats.scout_latencies))
+
+    if stats.errors:
+        print(f"Errors: {len(stats.errors)}")
+        for error in stats.errors[:20]:
+            print(f"  {error}")
+
+    return stats
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Load-test a MultiServer hosting Archipeladoku slots.")
+    parser.add_argument("--url", default="ws://localhost:38281", help="Server address.")
+    parser.add_argument("--password", default=None, help="Room password.")
+    parser.add_argument("--names", nargs="*", help="Slot names to connect as.")
+    parser.add_argument("--name-template", default="Player{}", help="Slot name template, used without --names.")
+    parser.add_argument("--count", type=int, default=1, help="Number of slots, used without --names.")
+    parser.add_argument("--checks-per-second", type=float, default=1.0, help="Location checks per player per second.")
+    parser.add_argument("--connect-concurrency", type=int, default=50, help="Maximum simultaneous connection attempts.")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait before considering a player stuck.")
+    parser.add_argument("--seed", default="archipeladoku", help="Seed for the check timing jitter.")
+    args = parser.parse_args()
+
+    asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
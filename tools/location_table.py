@@ -0,0 +1,216 @@
+"""Memory-mapped location table, a prebuilt lookup of the names in apworld/locations.txt.
+
+Not part of the apworld: utils registers names from locations.txt, this is for tools and processes that
+only look names up. Built by tools/build_locations.py --table.
+"""
+
+import array
+import bisect
+import mmap
+import struct
+import sys
+from typing import Iterable
+
+
+# File layout, all values little-endian:
+#
+#   Header:    magic "APDL", version u8, padding u8 x3, max number of boards u32, sha256 of the
+#              locations.txt contents after its checksum line (32 bytes), block item count u32,
+#              location count u32
+#   Sections:  block items, then locations, each with:
+#                ids       count u32, sorted
+#                order     count u32, indices of the entries sorted by name
+#                offsets   count + 1 u32, start of each name in the names, then their end
+#                names     UTF-8, in id order, each followed by a newline, padded with newlines to a
+#                          multiple of 4 bytes
+#
+# Everything is read in place from the buffer, so processes mapping the same file share its pages.
+# Big-endian hosts copy the integer arrays to swap their byte order, names are still read in place.
+
+magic = b"APDL"
+version = 1
+header_struct = struct.Struct("<4sB3xI32sII")
+
+
+def read_uint32s(view: memoryview, start: int, count: int) -> memoryview | array.array:
+    """Little-endian u32 values from the view, in place when the host byte order matches."""
+
+    values = view[start:start + count * 4].cast("I")
+
+    if sys.byteorder == "little":
+        return values
+
+    swapped = array.array("I", values)
+    swapped.byteswap()
+    values.release()
+
+    return swapped
+
+
+class NameSection:
+    """Read-only id and name lookups over one section of a location table."""
+
+    def __init__(self, view: memoryview, start: int, count: int):
+        self.count = count
+        self.ids = read_uint32s(view, start, count)
+        self.order = read_uint32s(view, start + count * 4, count)
+        self.offsets = read_uint32s(view, start + count * 8, count + 1)
+        names_start = start + count * 12 + 4
+        self.names = view[names_start:names_start + self.offsets[count]]
+        self.end = names_start + (self.offsets[count] + 3) // 4 * 4
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def release(self) -> None:
+
+        for values in (self.ids, self.order, self.offsets, self.names):
+            if isinstance(values, memoryview):
+                values.release()
+
+
+    def name_at(self, idx: int) -> str:
+
+        return str(self.names[self.offsets[idx]:self.offsets[idx + 1] - 1], "utf-8")
+
+
+    def get_name(self, name_id: int) -> str | None:
+        """Name registered for an id, or None."""
+
+        idx = bisect.bisect_left(self.ids, name_id)
+
+        if idx == self.count or self.ids[idx] != name_id:
+            return None
+
+        return self.name_at(idx)
+
+
+    def get_id(self, name: str) -> int | None:
+        """Id registered for a name, or None."""
+
+        (low, high) = (0, self.count)
+
+        while low < high:
+            middle = (low + high) // 2
+            if self.name_at(self.order[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low == self.count or self.name_at(self.order[low]) != name:
+            return None
+
+        return self.ids[self.order[low]]
+
+
+    def names_between(self, start_id: int, stop_id: int) -> list[str]:
+        """Names with ids from start_id up to but not including stop_id, in id order."""
+
+        first = bisect.bisect_left(self.ids, start_id)
+        last = bisect.bisect_left(self.ids, stop_id)
+
+        if first == last:
+            return []
+
+        return str(self.names[self.offsets[first]:self.offsets[last] - 1], "utf-8").split("\n")
+
+
+    def all_names(self) -> list[str]:
+        """Every name in id order, decoded at once."""
+
+        if self.count == 0:
+            return []
+
+        return str(self.names[:-1], "utf-8").split("\n")
+
+
+class LocationTable:
+    """Read-only view of a location table.
+
+    Opened from a path, the file is memory-mapped and shared with every other process mapping it.
+    Lookups binary search the mapping in place without building dicts for the whole namespace.
+    """
+
+    def __init__(self, buffer):
+        self.view = memoryview(buffer)
+
+        (file_magic, file_version, self.max_number_of_boards, self.checksum, item_count, location_count) = \
+            header_struct.unpack_from(self.view, 0)
+
+        if file_magic != magic:
+            raise ValueError("Not an Archipeladoku location table")
+
+        if file_version != version:
+            raise ValueError(f"Unsupported location table version: {file_version}")
+
+        self.block_items = NameSection(self.view, header_struct.size, item_count)
+        self.locations = NameSection(self.view, self.block_items.end, location_count)
+
+
+    @classmethod
+    def open(cls, path: str) -> "LocationTable":
+
+        with open(path, "rb") as file:
+            table = cls(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+        return table
+
+
+    def __enter__(self) -> "LocationTable":
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+
+        self.block_items.release()
+        self.locations.release()
+        buffer = self.view.obj
+        self.view.release()
+
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+
+def format_section(entries: Iterable[tuple[int, str]]) -> bytes:
+
+    entries = sorted(entries)
+    encoded_names = [name.encode("utf-8") + b"\n" for (_, name) in entries]
+    order = sorted(range(len(entries)), key=lambda idx: entries[idx][1])
+    offsets = [0]
+
+    for encoded_name in encoded_names:
+        offsets.append(offsets[-1] + len(encoded_name))
+
+    names = b"".join(encoded_names)
+    names += b"\n" * (-len(names) % 4)
+
+    return b"".join([
+        struct.pack(f"<{len(entries)}I", *(name_id for (name_id, _) in entries)),
+        struct.pack(f"<{len(order)}I", *order),
+        struct.pack(f"<{len(offsets)}I", *offsets),
+        names,
+    ])
+
+
+def format_location_table(
+    max_number_of_boards: int,
+    checksum: bytes,
+    block_items: Iterable[tuple[int, str]],
+    locations: Iterable[tuple[int, str]],
+) -> bytes:
+    """Build a location table from (id, name) pairs."""
+
+    block_items = list(block_items)
+    locations = list(locations)
+
+    return b"".join([
+        header_struct.pack(magic, version, max_number_of_boards, checksum, len(block_items), len(locations)),
+        format_section(block_items),
+        format_section(locations),
+    ])